@@ -0,0 +1,29 @@
+"""Adicionado indice para paginacao por cursor em item
+
+Revision ID: 3c1e7a9d52f0
+Revises: 4483cbfaccca
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1e7a9d52f0'
+down_revision: Union[str, Sequence[str], None] = '4483cbfaccca'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_item_created_at_id', 'logistic_stock_item',
+                    ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_item_created_at_id', table_name='logistic_stock_item')
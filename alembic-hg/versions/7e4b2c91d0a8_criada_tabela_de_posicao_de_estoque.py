@@ -0,0 +1,77 @@
+"""Criada tabela de posicao de estoque consolidada
+
+Revision ID: 7e4b2c91d0a8
+Revises: 3c1e7a9d52f0
+Create Date: 2026-10-18 11:03:27.640115
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e4b2c91d0a8'
+down_revision: Union[str, Sequence[str], None] = '3c1e7a9d52f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('logistic_stock_position_summary',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('location_id', sa.Integer(), nullable=False),
+                    sa.Column('stock_type', sa.String(length=50),
+                              server_default='', nullable=False),
+                    sa.Column('product_id', sa.Integer(), nullable=False),
+                    sa.Column('ztipo', sa.String(),
+                              server_default='', nullable=False),
+                    sa.Column('status', sa.String(), nullable=False),
+                    sa.Column('qty', sa.Integer(),
+                              server_default='0', nullable=False),
+                    sa.Column('updated_at', sa.DateTime(timezone=True),
+                              server_default=sa.text('now()'), nullable=False),
+                    sa.ForeignKeyConstraint(
+                        ['location_id'], ['logistica_groupaditionalinformation.id'], ),
+                    sa.ForeignKeyConstraint(
+                        ['product_id'], ['logistic_stock_product.id'], ),
+                    sa.PrimaryKeyConstraint('id'),
+                    sa.UniqueConstraint('location_id', 'stock_type', 'product_id', 'ztipo', 'status',
+                                        name='uq_stock_position_summary_key')
+                    )
+    op.create_index(op.f('ix_logistic_stock_position_summary_location_id'),
+                    'logistic_stock_position_summary', ['location_id'], unique=False)
+    op.create_index(op.f('ix_logistic_stock_position_summary_product_id'),
+                    'logistic_stock_position_summary', ['product_id'], unique=False)
+    op.create_index(op.f('ix_logistic_stock_position_summary_status'),
+                    'logistic_stock_position_summary', ['status'], unique=False)
+
+    # carga inicial a partir da posição atual dos items
+    op.execute("""
+        INSERT INTO logistic_stock_position_summary
+            (location_id, stock_type, product_id, ztipo, status, qty)
+        SELECT i.location_id,
+               COALESCE(o.stock_type, ''),
+               i.product_id,
+               COALESCE(i.extra_info -> 'consulta_sincrona' ->> 'ZTIPO', ''),
+               i.status,
+               COUNT(*)
+        FROM logistic_stock_item i
+        JOIN logistic_stock_movement m ON m.id = i.last_in_movement_id
+        JOIN logistic_stock_order_origin o ON o.id = m.order_origin_id
+        WHERE i.product_id IS NOT NULL
+        GROUP BY 1, 2, 3, 4, 5
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_logistic_stock_position_summary_status'),
+                  table_name='logistic_stock_position_summary')
+    op.drop_index(op.f('ix_logistic_stock_position_summary_product_id'),
+                  table_name='logistic_stock_position_summary')
+    op.drop_index(op.f('ix_logistic_stock_position_summary_location_id'),
+                  table_name='logistic_stock_position_summary')
+    op.drop_table('logistic_stock_position_summary')
@@ -0,0 +1,42 @@
+"""Criada tabela de contador diario dos seriais provisorios
+
+Revision ID: b91d3e6f2a45
+Revises: 7e4b2c91d0a8
+Create Date: 2026-10-18 14:21:09.532871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b91d3e6f2a45'
+down_revision: Union[str, Sequence[str], None] = '7e4b2c91d0a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('logistic_stock_provisional_serial_counter',
+                    sa.Column('day', sa.Date(), nullable=False),
+                    sa.Column('last_value', sa.Integer(), nullable=False),
+                    sa.PrimaryKeyConstraint('day')
+                    )
+
+    # continua a numeração a partir dos seriais já gerados (ILG-DDMMYY-NNNN)
+    op.execute("""
+        INSERT INTO logistic_stock_provisional_serial_counter (day, last_value)
+        SELECT to_date(substring(new_serial_number from 5 for 6), 'DDMMYY'),
+               MAX(CAST(substring(new_serial_number from 12) AS INTEGER))
+        FROM logistic_stock_item_provisional_serial
+        WHERE new_serial_number ~ '^ILG-[0-9]{6}-[0-9]+$'
+        GROUP BY 1
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('logistic_stock_provisional_serial_counter')
@@ -0,0 +1,30 @@
+"""Adicionado indice de volume no item do romaneio
+
+Revision ID: f1c83a6d0b57
+Revises: d2a7c5e19f36
+Create Date: 2026-10-18 15:34:12.604917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c83a6d0b57'
+down_revision: Union[str, Sequence[str], None] = 'd2a7c5e19f36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_reverse_item_romaneio_volume', 'logistic_stock_reverse_item',
+                    ['romaneio_id', 'volume_number'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reverse_item_romaneio_volume',
+                  table_name='logistic_stock_reverse_item')
@@ -0,0 +1,29 @@
+"""Adicionada versao no romaneio
+
+Revision ID: e58b1f93a7c2
+Revises: c47a0e2d9b63
+Create Date: 2026-10-18 15:02:41.118264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e58b1f93a7c2'
+down_revision: Union[str, Sequence[str], None] = 'c47a0e2d9b63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('logistic_stock_reverse', sa.Column(
+        'version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('logistic_stock_reverse', 'version')
@@ -39,6 +39,7 @@ async def create_client(
     client_in.client_code = client_in.client_code.lower()
     logger.info("Criando nova client...")
     _client = await client_crud.create(db=db, obj_in=client_in)
+    client_crud.cache.invalidate()
     return _client
 
 
@@ -60,6 +61,7 @@ async def delete_client(
         raise HTTPException(status_code=404, detail="client not found")
     logger.info("Deletando nova client...")
     _client = await client_crud.remove(db=db, id=id)
+    client_crud.cache.invalidate()
     return _client
 # exemplo
 
@@ -81,4 +83,5 @@ async def put_client(
                             detail=f"Cliente {id} não existe")
     payload.client_code = payload.client_code.lower()
     _client = await client_crud.update(db=db, db_obj=client, obj_in=payload)
+    client_crud.cache.invalidate()
     return _client
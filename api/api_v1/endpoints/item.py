@@ -3,17 +3,21 @@ from io import BytesIO
 from typing import Any, List, Annotated, Literal
 import logging
 from collections import defaultdict
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
 import fastapi
 from fastapi.responses import StreamingResponse
 import pandas as pd
 from sqlalchemy.orm import Session
-from schemas.consulta_sincrona_schema import ResponseConsultaSincSC
+from schemas.consulta_sincrona_schema import DeliveryValidationPayload, DeliveryValidationResult, ResponseConsultaSincSC
 from schemas.errors_stock_schema import StockErrorsCreate
 from schemas.product_schema import VolumeProductSchema
-from services.consulta_sincrona import ConsultaSincrona
+from services.consulta_sincrona import ConsultaSincrona, consulta_sincrona_cache
+from core.request import get_circuit_breaker
 from services.item import ItemService
-from utils import flatten_dict
+from services.item_export import ItemExportService
+from services.stock_summary import stock_summary_service
+from crud.crud_stock_summary import stock_summary_crud
 from crud.crud_movement import movement
 from crud.crud_item import item
 from crud.crud_errors_stock import errors_stock_crud
@@ -59,122 +63,78 @@ Ideal para dashboards e relatórios.
     # ============================
     # FILTERS (iguais ao endpoint original)
     # ============================
+    # lidos da posição de estoque consolidada (logistic_stock_position_summary)
     filters = [
         {"field": "status", "operator": "=", "value": status},
         {"field": "product.client.client_code", "operator": "=", "value": client},
+        {"field": "qty", "operator": ">", "value": 0},
     ]
 
     if locations_ids:
         filters.append({
-            "field": "location.id",
+            "field": "location_id",
             "operator": "in",
             "value": locations_ids
         })
 
     if stock_type:
         filters.append({
-            "field": "last_in_movement.origin.stock_type",
+            "field": "stock_type",
             "operator": "=",
             "value": stock_type
         })
 
     # ============================
-    # 1️ TOTAL POR PA + STOCK TYPE
-    # ============================
-    totais = await item.get_aggregates(
-        db=db,
-        filters=filters,
-        aggregations=[
-            {"op": "count", "field": "id", "alias": "total"}
-        ],
-        group_by=[
-            "location.cod_iata",
-            "location.nome",
-            "last_in_movement.origin.stock_type"
-
-        ]
-    )
-
-    # ============================
-    # 2️ QTD POR PRODUTO
-    # ============================
-    por_produto = await item.get_aggregates(
-        db=db,
-        filters=filters,
-        aggregations=[
-            {"op": "count", "field": "id", "alias": "qtd"}
-        ],
-        group_by=[
-            "location.cod_iata",
-            "location.nome",
-            "last_in_movement.origin.stock_type",
-            "product.sku",
-            "product.description"
-        ]
-    )
-
-    # ============================
-    # 3️ QTD POR ZTIPO (JSONB)
+    # 1️ TOTAL, QTD POR PRODUTO E QTD POR ZTIPO (JSONB) NUMA CONSULTA SÓ
     # ============================
-    por_ztipo = await item.get_aggregates(
+    pa_stock = [
+        "location.cod_iata",
+        "location.nome",
+        "stock_type",
+    ]
+    TOTAL, POR_PRODUTO, POR_ZTIPO = 0, 1, 2
+    rows = await stock_summary_crud.get_aggregates(
         db=db,
         filters=filters,
         aggregations=[
-            {"op": "count", "field": "id", "alias": "qtd"}
+            {"op": "sum", "field": "qty", "alias": "qtd"}
         ],
-        group_by=[
-            "location.cod_iata",
-            "location.nome",
-            "last_in_movement.origin.stock_type",
-            "extra_info.consulta_sincrona.ZTIPO",
-            "product.description"
+        group_by=pa_stock,
+        grouping_sets=[
+            pa_stock,
+            pa_stock + ["product.sku", "product.description"],
+            pa_stock + ["ztipo", "product.description"],
         ]
     )
 
     # ============================
-    # 4️ MONTAGEM DO PAYLOAD FINAL
+    # 2️ MONTAGEM DO PAYLOAD FINAL
     # ============================
     result: dict = defaultdict(dict)
 
-    # ---- totais
-    for row in totais:
+    for row in rows:
         nome_pa = F'{row.get("nome") or "N/A"} ({row["cod_iata"] or "N/A"})'
         pa = nome_pa
         st = row["stock_type"]
-
-        result[pa][st] = {
+        stock = result[pa].setdefault(st, {
             "type": st,
-            "total": row["total"],
+            "total": 0,
             "qtd_por_produto": {},
             "qtd_por_ztipo": {}
-        }
-
-    # ---- produtos
-    for row in por_produto:
-        nome_pa = F'{row.get("nome") or "N/A"} ({row["cod_iata"] or "N/A"})'
-        pa = nome_pa
-        st = row["stock_type"]
-        sku = row["sku"]
-        description = row["description"]
-        txt = f"{sku} - {description}"
-
-        if pa in result and st in result[pa]:
-            result[pa][st]["qtd_por_produto"][txt] = row["qtd"]
-
-    # ---- ztipo (JSON)
-    for row in por_ztipo:
-        nome_pa = F'{row.get("nome") or "N/A"} ({row["cod_iata"] or "N/A"})'
-        pa = nome_pa
-        st = row["stock_type"]
-        ztipo = row.get("ZTIPO") or "N/A"
-        description = row["description"]
-        txt = f"{ztipo} - {description}"
+        })
 
-        if pa in result and st in result[pa]:
-            result[pa][st]["qtd_por_ztipo"][txt] = row["qtd"]
+        if row["grouping_set"] == TOTAL:
+            stock["total"] = row["qtd"]
+        elif row["grouping_set"] == POR_PRODUTO:
+            txt = f'{row["sku"]} - {row["description"]}'
+            stock["qtd_por_produto"][txt] = row["qtd"]
+        elif row["grouping_set"] == POR_ZTIPO:
+            ztipo = row.get("ztipo") or "N/A"
+            txt = f'{ztipo} - {row["description"]}'
+            stock["qtd_por_ztipo"][txt] = row["qtd"]
 
     # ============================
-    # 5️ FORMATA SAÍDA FINAL
+    # 3️ FORMATA SAÍDA FINAL
     # ============================
     response = []
     for pa, stocks in result.items():
@@ -225,14 +185,16 @@ Ideal para dashboards e relatórios.
     # ============================
     # FILTERS (iguais ao endpoint original)
     # ============================
+    # lidos da posição de estoque consolidada (logistic_stock_position_summary)
     filters = [
         {"field": "status", "operator": "=", "value": status},
         {"field": "product.client.client_code", "operator": "=", "value": client},
+        {"field": "qty", "operator": ">", "value": 0},
     ]
 
     if locations_ids:
         filters.append({
-            "field": "location.id",
+            "field": "location_id",
             "operator": "in",
             "value": locations_ids
         })
@@ -240,7 +202,7 @@ Ideal para dashboards e relatórios.
 
     if stock_type:
         filters.append({
-            "field": "last_in_movement.origin.stock_type",
+            "field": "stock_type",
             "operator": "=",
             "value": stock_type
         })
@@ -251,16 +213,16 @@ Ideal para dashboards e relatórios.
     # ============================
     por_produto = None
     if agregate_by == 'product':
-        por_produto = await item.get_aggregates(
+        por_produto = await stock_summary_crud.get_aggregates(
             db=db,
             filters=filters,
             aggregations=[
-                {"op": "count", "field": "id", "alias": "qtd"}
+                {"op": "sum", "field": "qty", "alias": "qtd"}
             ],
             group_by=[
                 "location.cod_iata",
                 "location.nome",
-                "last_in_movement.origin.stock_type",
+                "stock_type",
                 "product.sku",
                 "product.description"
             ]
@@ -271,17 +233,17 @@ Ideal para dashboards e relatórios.
     # ============================
     por_ztipo = None
     if agregate_by == 'ztipo':
-        por_ztipo = await item.get_aggregates(
+        por_ztipo = await stock_summary_crud.get_aggregates(
             db=db,
             filters=filters,
             aggregations=[
-                {"op": "count", "field": "id", "alias": "qtd"}
+                {"op": "sum", "field": "qty", "alias": "qtd"}
             ],
             group_by=[
                 "location.cod_iata",
                 "location.nome",
-                "last_in_movement.origin.stock_type",
-                "extra_info.consulta_sincrona.ZTIPO",
+                "stock_type",
+                "ztipo",
                 "product.description"
             ]
         )
@@ -306,7 +268,7 @@ Ideal para dashboards e relatórios.
     elif agregate_by == "ztipo":
         for row in por_ztipo:
             nome_pa = F'{row.get("nome") or "N/A"} ({row["cod_iata"] or "N/A"})'
-            ztipo = row.get("ZTIPO") or "N/A"
+            ztipo = row.get("ztipo") or "N/A"
             response.append(
                 ResumeExportSchema(
                     pa=nome_pa,
@@ -350,10 +312,13 @@ Ideal para dashboards e relatórios.
 async def read_items_by_client(
         client: str,
         status: str,
+        response: Response,
         db: Session = Depends(deps.get_db_psql),
         stock_type: str = None,
         offset: int = 0,
         limit: int = 100,
+        keyset: bool = False,
+        cursor: str | None = None,
         locations_ids: Annotated[
             list[int] | None,
             Query(description="IDs das locations (pode repetir parâmetro)")
@@ -370,6 +335,11 @@ async def read_items_by_client(
 
     ### Ao usar lista de locations_ids, retorna apenas items que estejam em uma das locations informadas:
     - Exemplo: `?locations_ids=1&locations_ids=2&locations_ids=11`
+
+    ### Paginação por cursor (recomendado para paginar fundo):
+    - Use `keyset=true` na primeira página (o `offset` é ignorado)
+    - O próximo cursor vem no header `X-Next-Cursor`; envie em `?cursor=...` para a próxima página
+    - Sem o header, não há mais páginas
     """
 
     logger.info("Consultando products por client...")
@@ -391,15 +361,31 @@ async def read_items_by_client(
             "operator": "=",
             "value": stock_type
         })
-    itens = await item.get_multi_filters(
-        db=db,
-        filters=filters,
-        order_by="created_at",
-        order_desc=True,
-        distinct_on_id=True,  # ativa DISTINCT ON (Item.id)
-        offset=offset,
-        limit=limit,
-    )
+    if keyset or cursor:
+        try:
+            itens, next_cursor = await item.get_multi_keyset(
+                db=db,
+                filters=filters,
+                order_by="created_at",
+                order_desc=True,
+                after=cursor,
+                limit=limit,
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=fastapi.status.HTTP_400_BAD_REQUEST, detail=str(e))
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+    else:
+        itens = await item.get_multi_filters(
+            db=db,
+            filters=filters,
+            order_by="created_at",
+            order_desc=True,
+            distinct_on_id=True,  # ativa DISTINCT ON (Item.id)
+            offset=offset,
+            limit=limit,
+        )
     for _item in itens:
         _item.location_name = F'{_item.location.cod_iata}-{_item.location.nome}' if _item.location.cod_iata else _item.location.nome
         _item.product_sku = _item.product.sku
@@ -417,8 +403,8 @@ async def export_items_by_client(
         status: str,
         db: Session = Depends(deps.get_db_psql),
         stock_type: str = None,
-        # offset: int = 0,
-        limit: int = 5000,
+        format: Literal['xlsx', 'csv'] = 'xlsx',
+        limit: int | None = None,
         locations_ids: Annotated[
             list[int] | None,
             Query(description="IDs das locations (pode repetir parâmetro)")
@@ -435,6 +421,14 @@ async def export_items_by_client(
 
     ### Ao usar lista de locations_ids, retorna apenas items que estejam em uma das locations informadas:
     - Exemplo: `?locations_ids=1&locations_ids=2&locations_ids=11`
+
+    ### Formato:
+    - `xlsx` (padrão): **não é incremental**; as linhas são lidas e o arquivo é montado em
+      disco (memória constante) antes do primeiro byte ser enviado. Sem `limit`, exporta
+      no máximo 5000 linhas (mesmo teto de antes); exports maiores podem estourar o
+      timeout do cliente/proxy
+    - `csv`: enviado em streaming, as primeiras linhas saem enquanto a consulta ainda roda;
+      sem `limit` exporta tudo
     """
 
     logger.info("Consultando products por client...")
@@ -456,69 +450,52 @@ async def export_items_by_client(
             "operator": "=",
             "value": stock_type
         })
-    result = await item.get_multi_filters(
+
+    # Os headers saem antes das linhas, então o nome do arquivo é montado
+    # com uma consulta agregada das locations presentes no resultado
+    locations = await item.get_aggregates(
         db=db,
         filters=filters,
-        order_by="created_at",
-        order_desc=True,
-        distinct_on_id=True,  # ativa DISTINCT ON (Item.id)
-        # offset=offset,
-        limit=limit,
+        aggregations=[
+            {"op": "count", "field": "id", "alias": "total"}
+        ],
+        group_by=[
+            "location.cod_iata",
+            "location.nome",
+        ]
     )
     from_locations_str = ''
-    for _item in result:
-        _item.location_name = F'{_item.location.cod_iata}-{_item.location.nome}' if _item.location.cod_iata else _item.location.nome
-        _item.location_deps = _item.location.deposito if _item.location.deposito else None
-        _item.product_sku = _item.product.sku
-        _item.product_description = _item.product.description
-        _item.produtct_category = _item.product.category
-        _item.last_movement_in_date = _item.last_in_movement.created_at if _item.last_in_movement else None
-        _item.stock_type = _item.last_in_movement.origin.stock_type if _item.last_in_movement else None
+    for row in locations:
+        location_name = F'{row["cod_iata"]}-{row["nome"]}' if row["cod_iata"] else row["nome"]
         if from_locations_str != '':
-            from_locations_str += f'_and_{_item.location_name}' if _item.location_name not in from_locations_str else ''
+            from_locations_str += f'_and_{location_name}' if location_name not in from_locations_str else ''
         else:
-            from_locations_str = f'_from_{_item.location_name}'
-
-        # itero todos os objetos dentro de item.extra_info e crio eles e seus valores como colunas
-        extra_info = _item.extra_info or {}
-
-        if isinstance(extra_info, dict) and extra_info:
-            flat_extra = flatten_dict(extra_info)
-
-            for key, value in flat_extra.items():
-                # normaliza o nome da "coluna"
-                attr_name = f"extra_{key}".lower()
+            from_locations_str = f'_from_{location_name}'
 
-                # seta dinamicamente no item
-                setattr(_item, attr_name, value)
-
-    # === Converter para DataFrame ===
-    data = [r.__dict__ for r in result]
-    for d in data:
-        d.pop('_sa_instance_state', None)
-
-    df = pd.DataFrame(data)
     if client == 'cielo':
-        ordered_columns = list(ItemInDbListBaseCielo.__fields__.keys())
+        ordered_columns = list(ItemInDbListBaseCielo.model_fields.keys())
     else:
-        ordered_columns = list(ItemInDbListBase.__fields__.keys())
-    df = df.reindex(columns=ordered_columns)
-
-    for col in df.select_dtypes(include=["datetimetz"]).columns:
-        df[col] = df[col].dt.tz_localize(None)
+        ordered_columns = list(ItemInDbListBase.model_fields.keys())
 
-    # === Gerar Excel com formatação ===
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name="IN_DEPOT_ITEMS")
+    if limit is None and format == 'xlsx':
+        # o xlsx só começa a ser enviado depois de montado: mantém o teto padrão
+        limit = ItemExportService.XLSX_DEFAULT_LIMIT
 
-    output.seek(0)
+    export = ItemExportService(
+        filters=filters, ordered_columns=ordered_columns, limit=limit)
 
     now = datetime.now()
-    filename = f"stock{from_locations_str}_{now.strftime('%d%m%y_%H%M')}.xlsx"
+    filename = f"stock{from_locations_str}_{now.strftime('%d%m%y_%H%M')}.{format}"
+
+    if format == 'csv':
+        return StreamingResponse(
+            export.iter_csv(),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        )
 
     return StreamingResponse(
-        output,
+        export.iter_xlsx(),
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
@@ -578,6 +555,7 @@ async def read_volumn_product_for_dce(
     items = await item.get_multi_filters(
         db=db,
         filters=filters,
+        load="product",
     )
     if len(items) < len(seriais):
         found_serials = {_item.serial for _item in items}
@@ -616,6 +594,7 @@ async def read_item_serial(
     _item = await item.get_last_by_filters(
         db=db,
         filters=filters,
+        load="listing",
     )
     if not _item:
         raise HTTPException(
@@ -691,19 +670,143 @@ async def put_item_id(
         raise HTTPException(status_code=404, detail="item not found")
 
     logger.info("Atualizando item...")
-    _item = await item.update(db=db, db_obj=_item, obj_in=payload)
+    summary_before = await stock_summary_service.snapshot(db=db, item_ids=[id], lock=True)
+    # item e resumo no mesmo commit (o lock do snapshot vale até lá)
+    _item = await item.update(db=db, db_obj=_item, obj_in=payload, commit=False)
+    summary_after = await stock_summary_service.snapshot(db=db, item_ids=[id])
+    await stock_summary_service.apply(
+        db=db, before=summary_before, after=summary_after)
     return _item
 
 
+@router.get("/consulta-sincrona/cache", response_model=Any)
+async def read_consulta_sincrona_cache_stats() -> Any:
+    """
+    # Estatísticas do cache da consulta síncrona (hits, misses, tamanho) e estado do circuit breaker
+    """
+    return {
+        **consulta_sincrona_cache.stats(),
+        "circuit": get_circuit_breaker('sap_sync').stats(),
+    }
+
+
+@router.post("/delivery/validate", response_model=List[DeliveryValidationResult])
+async def validate_items_delivery(
+        client: str,
+        payload: DeliveryValidationPayload,
+        db: Session = Depends(deps.get_db_psql),
+        http_client: httpx.AsyncClient = Depends(deps.get_http_client)
+) -> Any:
+    """
+    # Validação em lote para o retorno do picking
+
+    Aplica as mesmas validações do `GET /delivery/{serial}` para uma lista de seriais:
+    - Items consultados no banco com uma única query
+    - Consulta síncrona no SAP em paralelo (com limite de concorrência e cache)
+    - Retorna o resultado de cada serial (`valid` / `error`), sem interromper no primeiro erro
+    """
+    if client != 'cielo':
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Endpoint disponível apenas para o cliente CIELO",
+        )
+    error_origin = 'POST/api/v1/delivery/validate'
+    location_id = payload.location_id or 0
+    serials = list(dict.fromkeys(serial.upper() for serial in payload.serials))
+
+    rows = await item.get_multi_columns(
+        db=db,
+        filters=[
+            {"field": "serial", "operator": "in", "value": serials},
+            {"field": "product.client.client_code",
+                "operator": "=", "value": client},
+        ],
+        columns=["serial", "status", "location_id", "location.deposito"]
+    )
+    items_by_serial = {row["serial"]: row for row in rows}
+
+    results: dict = {}
+    erros: List[StockErrorsCreate] = []
+
+    def _invalido(serial: str, detail: str, message_error: str | None, item_status: str | None):
+        results[serial] = DeliveryValidationResult(
+            serial=serial, valid=False, error=detail)
+        if message_error:
+            erros.append(StockErrorsCreate(
+                error_origin=error_origin,
+                message_error=message_error,
+                serial=serial,
+                status=item_status,
+                location_id=location_id if location_id != 0 else None))
+
+    to_check = []
+    for serial in serials:
+        _item = items_by_serial.get(serial)
+        if not _item:
+            _invalido(serial,
+                      "Item not found (O serial informado não existe ou não pertence a este cliente)",
+                      'Item not found (O serial informado não existe ou não pertence a este cliente)',
+                      'Não localizado')
+        elif _item["status"] != 'IN_DEPOT':
+            _invalido(serial,
+                      f"Item com serial {serial} não está com status IN_DEPOT. Status atual: {_item['status']}",
+                      f'Serial encontrado, porém não está IN_DEPOT. Status atual: {_item["status"]}',
+                      _item["status"])
+        elif _item["location_id"] != location_id and location_id != 0:
+            _invalido(serial,
+                      f"Item com serial {serial} está localizado na location {_item['location_id']} que é diferente da location do retorno do picking {location_id}.",
+                      f'Serial encontrado, porém sua location não condiz com a do usuário. Location_id do item: {_item["location_id"]}, location_id do pedido: {location_id}',
+                      _item["status"])
+        else:
+            to_check.append(serial)
+
+    cons_sinc_service = ConsultaSincrona(client=http_client)
+    consultas = await cons_sinc_service.executar_many(
+        to_check, bypass_cache=payload.bypass_cache)
+
+    for serial in to_check:
+        _item = items_by_serial[serial]
+        consulta = consultas[serial]
+        if not consulta.ok:
+            # falha de comunicação com o SAP não é registrada como erro do item
+            _invalido(serial, consulta.error, None, _item["status"])
+            continue
+
+        consulta_sincrona = consulta.data
+        deposito = _item["location_deposito"]
+        if deposito != consulta_sincrona.LGORT:
+            _invalido(serial,
+                      f"Item {serial} está no depósito ({deposito}) que é diferente do depósito SAP ({consulta_sincrona.LGORT}).",
+                      f'Serial encontrado, porém depósito do SAP é diferente do depósito do item no banco. DEPS do Arancia: "{deposito}", DEPS do SAP: "{consulta_sincrona.LGORT}"',
+                      _item["status"])
+        elif not (consulta_sincrona.STTXU.strip() == 'DESN' and consulta_sincrona.STTXT.strip() == 'DEPS'):
+            _invalido(serial,
+                      f"Item com serial {serial} não está em depósito no SAP. Status SAP: {consulta_sincrona.STTXT} - {consulta_sincrona.STTXU}",
+                      f'Serial encontrado, porém não está em depósito no SAP. Status SAP: {consulta_sincrona.STTXT} - {consulta_sincrona.STTXU}',
+                      _item["status"])
+        else:
+            results[serial] = DeliveryValidationResult(
+                serial=serial, valid=True, sap=consulta_sincrona)
+
+    if erros:
+        await errors_stock_crud.create_multi(db=db, obj_in=erros)
+
+    return [results[serial] for serial in serials]
+
+
 @router.get("/delivery/{serial}", response_model=ItemInRetornoPickingBase)
 async def read_item_delivery(
         client: str,
         serial: str,
         location_id: int = None,
-        db: Session = Depends(deps.get_db_psql)
+        bypass_cache: bool = False,
+        db: Session = Depends(deps.get_db_psql),
+        http_client: httpx.AsyncClient = Depends(deps.get_http_client)
 ) -> Any:
     """
     # Consulta para uso do retorno do picking
+
+    - A consulta síncrona usa cache por serial; `bypass_cache=true` força a consulta no SAP
     """
     # Rodo o upper do serial para ficar tudo caixa alta
 
@@ -770,8 +873,9 @@ async def read_item_delivery(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Item com serial {serial} está localizado na location {_item.location_id} que é diferente da location do retorno do picking {location_id}.",
             )
-        cons_sinc_service = ConsultaSincrona()
-        consulta_sincrona: ResponseConsultaSincSC = await cons_sinc_service.executar_by_serial(serial)
+        cons_sinc_service = ConsultaSincrona(client=http_client)
+        consulta_sincrona: ResponseConsultaSincSC = await cons_sinc_service.executar_by_serial(
+            serial, bypass_cache=bypass_cache)
 
         # valido se o depósito do item é o mesmo da consulta síncrona, se não for, retorno erro
         if _item.location.deposito != consulta_sincrona.LGORT:
@@ -1,7 +1,8 @@
-from typing import Any, List
+from typing import Any, List, Literal
 import logging
 
-from fastapi import APIRouter, Depends, HTTPException
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 
 from crud.crud_movement import movement
@@ -13,7 +14,9 @@ from schemas.product_schema import ProductCreate, ProductUpdate, ProductInDbBase
 from schemas.item_schema import ItemCreate, ItemUpdate, ItemInDbBase
 from schemas.movement_schema import MovementPayloadListItem, MovementPayload, MovementInDbBase
 from schemas.romaneio_schema import RomaneioInDbBase, RomaneioUpdate
+from schemas.stock_import_schema import StockImportResult
 from services.movement import MovementService
+from services.stock_import import StockImportService
 
 from api import deps
 
@@ -23,14 +26,30 @@ logger = logging.getLogger(__name__)
 
 @router.get("/", response_model=List[MovementInDbBase])
 async def read_movements(
+        response: Response,
         db: Session = Depends(deps.get_db_psql),
         skip: int = 0,
         limit: int = 100,
+        keyset: bool = False,
+        cursor: str | None = None,
 ) -> Any:
     """
     Consulta todas as movimentos possíveis
+
+    ### Paginação por cursor:
+    - Use `keyset=true` na primeira página (o `skip` é ignorado)
+    - O próximo cursor vem no header `X-Next-Cursor`; envie em `?cursor=...` para a próxima página
     """
     logger.info("Consultando movements...")
+    if keyset or cursor:
+        try:
+            _movements, next_cursor = await movement.get_multi_keyset(
+                db=db, order_by="id", after=cursor, limit=limit)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return _movements
     return await movement.get_multi(db=db, skip=skip, limit=limit)
 
 
@@ -38,6 +57,7 @@ async def read_movements(
 async def create_movement(
         *,
         db: Session = Depends(deps.get_db_psql),
+        http_client: httpx.AsyncClient = Depends(deps.get_http_client),
         payload: MovementPayload,
 ) -> Any:
     """
@@ -51,11 +71,11 @@ async def create_movement(
 > **Nota:** Use sempre `product_id` quando disponível.
 """
 
-    service = MovementService()
+    service = MovementService(http_client=http_client)
     service_response = await service.create_movement(db=db, payload=payload)
     # Se for um movimento de retorno, verifico se é do arancia e atualizo o romaneio
     if payload.movement_type == 'RETURN':
-        origin_item = origin.get(db=db, id=payload.order_origin_id)
+        origin_item = await origin.get_cached(db=db, id=payload.order_origin_id)
         if origin_item and origin_item.origin_name == 'arancia' and origin_item.project_name == 'RETURN':
             # obtenho o romaneio_id e atualizo o status para fechado
             await service.update_rom_by_movement(db=db, romaneio_in=payload.order_number, movement_type=payload.movement_type.value)
@@ -66,6 +86,7 @@ async def create_movement(
 async def create_movement(
         *,
         db: Session = Depends(deps.get_db_psql),
+        http_client: httpx.AsyncClient = Depends(deps.get_http_client),
         payload: MovementPayloadListItem,
 ) -> Any:
     """
@@ -78,19 +99,8 @@ async def create_movement(
 
 > **Nota:** Use sempre `product_id` quando disponível.
 """
-    if payload.movement_type.value != 'IN':
-        for item_payload in payload.item:
-            _item = await item_crud.get_last_by_filters(
-                db=db,
-                filters={
-                    'serial': {'operator': '==', 'value': item_payload.serial}
-                })
-            if not _item:
-                raise HTTPException(
-                    status_code=400, detail=f"Item com serial {item_payload.serial} não encontrado no sistema. Operação cancelada!")
-
-    service = MovementService()
-    items = []
+    service = MovementService(http_client=http_client)
+    payloads = []
     for item in payload.item:
 
         item_volume_number = str(
@@ -107,7 +117,7 @@ async def create_movement(
             raise HTTPException(
                 status_code=400, detail="É necessário informar o volume_number e kit_number, seja no payload geral ou em cada item.")
 
-        payload_item = MovementPayload(
+        payloads.append(MovementPayload(
             item=item,
             client_name=payload.client_name,
             movement_type=payload.movement_type,
@@ -119,15 +129,54 @@ async def create_movement(
             kit_number=item_kit_number,
             created_by=payload.created_by,
             extra_info=payload.extra_info if payload.extra_info else None,
-        )
+        ))
 
-        service_response = await service.create_movement(db=db, payload=payload_item)
-        items.append(service_response)
+    # Processa todos os seriais em lote (uma transação). Erros de validação voltam item a item.
+    items = await service.create_movement_batch(
+        db=db, payloads=payloads, create_types=('IN',))
 
     # Se for um movimento de retorno, verifico se é do arancia e atualizo o romaneio
     if payload.movement_type.value == 'RETURN':
-        origin_item = await origin.get(db=db, id=payload.order_origin_id)
+        origin_item = await origin.get_cached(db=db, id=payload.order_origin_id)
         if origin_item and origin_item.origin_name == 'arancia' and origin_item.project_name == 'REVERSA':
             # obtenho o romaneio_id e atualizo o status para fechado
             await service.update_rom_by_movement(db=db, romaneio_in=payload.order_number, movement_type=payload.movement_type.value)
     return items
+
+
+@router.post("/import", response_model=StockImportResult)
+async def import_stock(
+        *,
+        db: Session = Depends(deps.get_db_psql),
+        request: Request,
+        created_by: str,
+        format: Literal['csv', 'jsonl'] = 'csv',
+        order_origin_id: int | None = None,
+        dry_run: bool = False,
+) -> Any:
+    """
+# Carga inicial de estoque em massa (CSV ou JSONL)
+
+O corpo da requisição é o próprio arquivo, lido em streaming (ex.: `curl --data-binary @estoque.csv`).
+Para cada linha aceita é criado o item (`IN_DEPOT`) e o movimento de entrada (`IN`), numa única transação.
+
+### Colunas
+- Obrigatórias: `serial`, `sku`, `location_id`
+- Opcionais: `order_origin_id` (padrão: o da query), `order_number`, `volume_number`, `kit_number`, `extra_info` (JSON)
+
+### Recusas
+- Linhas inválidas, serial duplicado no arquivo, sku/local/origem inexistentes e serial que já existe no estoque
+  são recusados sem interromper a carga; cada recusa volta com a linha e o motivo em `rejects`
+- `dry_run=true` valida tudo e desfaz no fim (nada é gravado)
+
+> Para movimentar itens que já existem, use `/move-list-items`.
+"""
+    service = StockImportService(
+        created_by=created_by,
+        order_origin_id=order_origin_id,
+        dry_run=dry_run
+    )
+    try:
+        return await service.run(db=db, chunks=request.stream(), format=format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
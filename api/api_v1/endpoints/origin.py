@@ -52,6 +52,7 @@ async def create_origin(
     """
     logger.info("Criando nova origin...")
     _origin = await origin.create(db=db, obj_in=origin_in)
+    origin.cache.invalidate()
     return _origin
 
 
@@ -73,5 +74,6 @@ async def delete_origin(
         raise HTTPException(status_code=404, detail="origin not found")
     logger.info("Deletando nova origin...")
     _origin = await origin.remove(db=db, id=id)
+    origin.cache.invalidate()
     return _origin
 # exemplo
@@ -1,4 +1,4 @@
-from typing import Any, List
+from typing import Any, List, Union
 import logging
 
 from fastapi import APIRouter, Depends, HTTPException, status
@@ -10,6 +10,8 @@ from crud.crud_romaneio import romaneio_crud as romaneio
 from crud.crud_item import item as item_crud
 from crud.crud_client import client_crud
 from schemas.romaneio_item_schema import RomaneioItemPayload, RomaneioItemCreate, RomaneioItemInDbBase, RomaneioItemResponse, RomaneioItemUpdateKit
+from schemas.romaneio_item_schema import RomaneioItemDeltaResponse
+from schemas.romaneio_item_schema import RomaneioItemBulkPayload, RomaneioItemBulkResponse
 from schemas.romaneio_schema import RomaneioCreateV2, RomaneioUpdate, RomaneioInDbBase, RomaneioCreate, RomaneioCreateClient
 
 from services.romaneio import RomaneioItemService
@@ -87,10 +89,12 @@ async def read_romaneio(
     return existing_romaneio
 
 
-@router.post("/insert-items/{romaneio_in}", response_model=RomaneioItemResponse)
+@router.post("/insert-items/{romaneio_in}", response_model=Union[RomaneioItemDeltaResponse, RomaneioItemResponse])
 async def insert_items_romaneio(
         romaneio_in: str,
         item: RomaneioItemPayload,
+        incremental: bool = False,
+        known_version: int | None = None,
         db: Session = Depends(deps.get_db_psql)):
     """
     # Insere os itens no romaneio informado
@@ -108,14 +112,42 @@ async def insert_items_romaneio(
     * Se o item estiver em outro romaneio ativo, retorna um erro
     * Se o item estiver em outro romaneio inativo, permite a inserção
     * Atualiza o item com o romaneio_id
+
+    ## Resposta incremental
+    * Toda inserção incrementa a `version` do romaneio, que volta na resposta
+    * Com `incremental=true` e `known_version` igual à versão que o cliente já tem,
+      retorna só o volume afetado e o kit inserido (`RomaneioItemDeltaResponse`)
+    * Se a versão não bater (outro coletor alterou o romaneio) ou o item já estava no
+      romaneio, retorna o romaneio inteiro
     """
     service = RomaneioItemService()
 
-    romaneio_list = await service.insere_novo_item(db=db, romaneio_in=romaneio_in, item=item)
+    romaneio_list = await service.insere_novo_item(
+        db=db, romaneio_in=romaneio_in, item=item,
+        incremental=incremental, known_version=known_version)
 
     return romaneio_list
 
 
+@router.post("/insert-items/{romaneio_in}/bulk", response_model=RomaneioItemBulkResponse)
+async def insert_items_romaneio_bulk(
+        romaneio_in: str,
+        payload: RomaneioItemBulkPayload,
+        db: Session = Depends(deps.get_db_psql)):
+    """
+    # Insere uma lista de seriais no romaneio informado (mesmo volume)
+
+    Mesmas validações do `POST /insert-items/{romaneio_in}`, aplicadas ao lote inteiro:
+    * Seriais válidos são inseridos com um único INSERT, com kits numerados em sequência
+    * Seriais recusados não interrompem o lote: cada um volta em `results` com o motivo
+    * Seriais que já estão no romaneio são ignorados (aceitos, sem nova inserção)
+    * O romaneio atualizado é retornado uma única vez em `romaneio`
+    """
+    service = RomaneioItemService()
+
+    return await service.insere_itens_em_lote(db=db, romaneio_in=romaneio_in, payload=payload)
+
+
 @router.post("/", response_model=RomaneioItemResponse, deprecated=True)
 async def create_romaneio(
         *,
@@ -129,7 +161,7 @@ async def create_romaneio(
     """
 
     logger.info("Criando novo romaneio...")
-    _client = await client_crud.get_first_by_filter(db=db, filterby="client_code", filter=romaneio_in.client_name)
+    _client = await client_crud.get_by_code_cached(db=db, client_code=romaneio_in.client_name)
     new_rom = RomaneioCreate(
         client_id=_client.id,
         location_id=romaneio_in.location_id,
@@ -166,10 +198,12 @@ async def put_romaneio(
     return _romaneio
 
 
-@router.delete(path="/{romaneio_in}/", response_model=RomaneioItemResponse)
+@router.delete(path="/{romaneio_in}/", response_model=Union[RomaneioItemDeltaResponse, RomaneioItemResponse])
 async def delete_item_rom(
         romaneio_in: str,
         serial: str,
+        incremental: bool = False,
+        known_version: int | None = None,
         db: Session = Depends(deps.get_db_psql),
 ) -> Any:
     """
@@ -178,10 +212,12 @@ async def delete_item_rom(
     ⚠️⚠️⚠️⚠️⚠️⚠️⚠️⚠️⚠️⚠️⚠️⚠️
 
     ### CUIDADO: Essa ação é irreversível!
+
+    Com `incremental=true` e `known_version` igual à versão anterior a esta remoção, retorna só o volume afetado.
     """
 
     item = await item_crud.get_first_by_filter(
-        db=db, filterby="serial", filter=serial)
+        db=db, filterby="serial", filter=serial, load="minimal")
     item_id = item.id
     _romaneio_item = await romaneio_item.get_last_by_filters(
         db=db,
@@ -201,29 +237,31 @@ async def delete_item_rom(
         )
 
     logger.info("Deletando nova product...")
-    _romaneio_item = await romaneio_item.remove(db=db, id=_romaneio_item.id)
+    _romaneio = _romaneio_item.romaneio
+    # versão incrementada e kits do volume renumerados no mesmo commit do delete
+    version = await romaneio.bump_version(db=db, id=_romaneio.id)
+    if version is None:
+        # o romaneio saiu de ABERTO depois da leitura acima (finalização reservada)
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Romaneio não está mais ABERTO (em finalização ou fechado)",
+        )
+    _romaneio_item = await romaneio_item.remove_and_renumber(db=db, db_obj=_romaneio_item)
 
     service = RomaneioItemService()
-    existing_romaneio = await service.consulta_romaneio(db=db, romaneio_in=romaneio_in)
-    if not existing_romaneio:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="romaneio not found")
-
-    # Refatoro o kit_number de acordo com a lista de kits
-    for volumn in existing_romaneio.volums:
-        for j, kit in enumerate(volumn.kits, 1):
-            if kit.kit_number != str(j):
-                kit.kit_number = str(j)
-                item_obj = await romaneio_item.get_first_by_filter(
-                    db=db,
-                    filterby="id",
-                    filter=kit.id)
-
-                await romaneio_item.update(
-                    db=db,
-                    db_obj=item_obj,
-                    obj_in=RomaneioItemUpdateKit(
-                        kit_number=kit.kit_number)
-                )
+    # compara com a versão devolvida pelo bump (romaneio travado), não com a lida antes
+    if incremental and known_version is not None and known_version == version - 1:
+        return await service.build_romaneio_delta(
+            db=db,
+            romaneio=_romaneio,
+            volume_number=_romaneio_item.volume_number,
+            version=version,
+            action='removed'
+        )
 
-    return existing_romaneio
+    # consulto o romaneio atualizado e retorno a lista de items atrelados a ele
+    romaneio_list = await romaneio_item.get_multi_filter(db=db, filterby="romaneio_id", filter=_romaneio.id)
+    if not romaneio_list:
+        return service.build_empty_response(romaneio_in, _romaneio, version=version)
+    return service.build_romaneio_response(romaneio_list, _romaneio, version=version)
@@ -1,7 +1,7 @@
 from typing import Any, List, Literal
 import logging
 
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Response, status, BackgroundTasks
 from sqlalchemy.orm import Session
 from crud.crud_origin import origin
 from crud.crud_movement import movement as movement_crud
@@ -13,10 +13,11 @@ from schemas.item_schema import ItemPayload
 from schemas.location_schema import LocationBasic
 from schemas.movement_schema import MovementBase, MovementCreate, MovementPayload
 from schemas.romaneio_item_schema import RomaneioItemPayload, RomaneioItemCreate, RomaneioItemInDbBase, RomaneioItemResponse, RomaneioItemUpdateKit
-from schemas.romaneio_schema import RomaneioCreateV2, PayloadRomaneioCreateV2, RomaneioFineshedResponse, RomaneioFinisheData, RomaneioInDbBase, RomaneioCreate, RomaneioCreateClient, RomaneioListBase, RomaneioUpdate
+from schemas.romaneio_schema import RomaneioCreateV2, PayloadRomaneioCreateV2, RomaneioFineshedResponse, RomaneioFinisheData, RomaneioFinishJobStatus, RomaneioInDbBase, RomaneioCreate, RomaneioCreateClient, RomaneioListBase, RomaneioUpdate
 
 from services.romaneio import RomaneioItemService
 from services.movement import MovementService
+from services.romaneio_jobs import romaneio_finish_jobs
 from api import deps
 
 router = APIRouter()
@@ -34,7 +35,7 @@ async def create_romaneio(
     """
 
     logger.info("Criando novo romaneio...")
-    _client = await client_crud.get_first_by_filter(db=db, filterby="client_code", filter=romaneio_in.client_name)
+    _client = await client_crud.get_by_code_cached(db=db, client_code=romaneio_in.client_name)
     new_rom = RomaneioCreateV2(
         client_id=_client.id,
         location_id=romaneio_in.origin_id if romaneio_in.location_id == 0 else romaneio_in.location_id,
@@ -55,6 +56,9 @@ async def finish_romaneio(
         romaneio_number: str,
         location_id: int,
         finish_data: RomaneioFinisheData,
+        background_tasks: BackgroundTasks,
+        response: Response,
+        async_mode: bool = False,
         db: Session = Depends(deps.get_db_psql)
 ) -> Any:
     """
@@ -63,6 +67,13 @@ async def finish_romaneio(
     Finaliza o romaneio alterando o status para 'FECHADO'
     Gera movimentos de saída para todos os items do romaneio de acordo com o finish_data.movement_type
     Atualiza posição dos itens no estoque
+    Retorna 409 se o romaneio já estiver sendo finalizado por outra requisição
+    Romaneio 'EM PROCESSAMENTO' sem progresso há mais de ROMANEIO_FINISH_CLAIM_TIMEOUT
+    segundos (finalização interrompida) pode ser finalizado novamente
+
+    ### async_mode=true
+    - Retorna imediatamente (HTTP 202) com o `job_id` e o romaneio fica 'EM PROCESSAMENTO'
+    - Acompanhe o progresso em `GET /finish/jobs/{job_id}`
     """
     if finish_data.movement_type.value not in ('RETURN', 'TRANSFER'):
         raise HTTPException(
@@ -92,18 +103,7 @@ async def finish_romaneio(
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail=f"Romaneio está com status {existing_romaneio.status_rom}")
 
-    # atualiza o status do romaneio para FECHADO
-    romaneio_update = RomaneioUpdate(
-        status_rom='EM PROCESSAMENTO',
-        update_by=finish_data.finished_by,
-        updated_at=finish_data.finished_at
-    )
-    await romaneio.update(db=db, db_obj=existing_romaneio, obj_in=romaneio_update)
-
-    # gera movimentos de saída para todos os items do romaneio
-    romaneio_list = await romaneio_item.get_multi_filter(db=db, filterby="romaneio_id", filter=existing_romaneio.id)
-
-    new_order_origin_id = await origin.get_last_by_filters(
+    new_order_origin_id = await origin.get_last_by_filters_cached(
         db=db,
         filters={
             'origin_name': {'operator': '==', 'value': 'arancia'},
@@ -112,47 +112,50 @@ async def finish_romaneio(
         }
     )
 
-    movement_service = MovementService()
-    for item_rom in romaneio_list:
-        # last_movement = await movement_crud.get_last_movement_by_item(db=db, item_id=item.item_id)
-        # if not last_movement:
-        #     raise HTTPException(
-        #         status_code=status.HTTP_404_NOT_FOUND,
-        #         detail=f"Item {item.item_id} não possui movimento de entrada registrado.",
-        #     )
-
-        item_data = ItemPayload(
-            product_id=item_rom.item.product_id,
-            serial=item_rom.item.serial
+    # reserva o romaneio (ABERTO -> EM PROCESSAMENTO) com compare-and-set:
+    # uma segunda finalização concorrente não passa daqui; um romaneio
+    # EM PROCESSAMENTO parado há mais que o lease (finalização interrompida) é reassumido
+    claimed = await romaneio.claim_for_finish(
+        db=db,
+        id=existing_romaneio.id,
+        update_by=finish_data.finished_by
+    )
+    if not claimed:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Romaneio já está em processamento ou foi finalizado por outra requisição")
+
+    if async_mode:
+        job = romaneio_finish_jobs.create(romaneio_number=romaneio_number)
+        background_tasks.add_task(
+            romaneio_finish_jobs.run,
+            job_id=job.job_id,
+            romaneio_id=existing_romaneio.id,
+            finish_data=finish_data,
+            order_origin_id=new_order_origin_id.id if new_order_origin_id else None
         )
-
-        _extra_info = {
-            "external_order_number": finish_data.external_order_number
-        } if finish_data.external_order_number else None
-        item_movement = MovementPayload(
-            item=item_data,
-            client_name=existing_romaneio.client.client_code,
-            movement_type=finish_data.movement_type,
-            from_location_id=existing_romaneio.origin_id,
-            to_location_id=existing_romaneio.destination_id,
-            order_origin_id=new_order_origin_id.id if new_order_origin_id else None,
-            order_number=romaneio_number,
-            volume_number=item_rom.volume_number,
-            kit_number=item_rom.kit_number,
-            created_by=finish_data.finished_by,
-            extra_info=_extra_info
+        response.status_code = status.HTTP_202_ACCEPTED
+        return RomaneioFineshedResponse(
+            romaneio_number=romaneio_number,
+            status_rom="EM PROCESSAMENTO",
+            description="Romaneio em processamento. Acompanhe pelo job_id.",
+            job_id=job.job_id
         )
 
-        await movement_service.create_movement(
+    # gera movimentos de saída para todos os items do romaneio, atualiza a posição
+    # dos itens e fecha o romaneio numa única transação
+    movement_service = MovementService()
+    try:
+        await movement_service.finish_romaneio(
             db=db,
-            payload=item_movement
+            romaneio=existing_romaneio,
+            finish_data=finish_data,
+            order_origin_id=new_order_origin_id.id if new_order_origin_id else None
         )
-    # atualiza o status do romaneio para FECHADO
-    await movement_service.update_rom_by_movement(
-        db=db,
-        romaneio_in=romaneio_number,
-        movement_type=finish_data.movement_type.value
-    )
+    except BaseException:
+        # nada foi gravado: devolve o romaneio para ABERTO
+        await romaneio.release_finish(db=db, id=existing_romaneio.id)
+        raise
     return RomaneioFineshedResponse(
         romaneio_number=romaneio_number,
         status_rom="FECHADO",
@@ -161,17 +164,40 @@ async def finish_romaneio(
     )
 
 
+@router.get("/finish/jobs/{job_id}", response_model=RomaneioFinishJobStatus)
+async def read_finish_job(
+        job_id: str,
+) -> Any:
+    """
+    # Consulta o andamento de uma finalização de romaneio em background
+    * Retorna os contadores de itens processados/com falha
+    * Se o job não existir (ou foi criado em outro worker), retorna 404
+    """
+    job = romaneio_finish_jobs.get(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Job não encontrado")
+    return job
+
+
 @router.get("/", response_model=List[RomaneioListBase])
 async def read_romaneios(
+        response: Response,
         location_id: int = 0,
         status: Literal['ABERTO', 'PRONTO',
                         'EM PROCESSAMENTO', 'FECHADO', 'CANCELADO'] = None,
         db: Session = Depends(deps.get_db_psql),
         offset: int = 0,
         limit: int = 100,
+        keyset: bool = False,
+        cursor: str | None = None,
 ) -> Any:
     """
     # Consulta todas as romaneios possíveis, com paginação
+
+    ### Paginação por cursor:
+    - Use `keyset=true` na primeira página (o `offset` é ignorado)
+    - O próximo cursor vem no header `X-Next-Cursor`; envie em `?cursor=...` para a próxima página
     """
     logger.info("Consultando romaneios...")
     if not location_id and location_id != 0:
@@ -186,12 +212,26 @@ async def read_romaneios(
         filters.append(
             {"field": "location_id", "operator": "=", "value": location_id})
 
-    _romaneios = await romaneio.get_multi_filters(
-        db=db,
-        filters=filters,
-        offset=offset,
-        limit=limit
-    ) if location_id != 0 or status else await romaneio.get_multi(db=db, skip=offset, limit=limit)
+    if keyset or cursor:
+        try:
+            _romaneios, next_cursor = await romaneio.get_multi_keyset(
+                db=db,
+                filters=filters,
+                order_by="id",
+                after=cursor,
+                limit=limit
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+    else:
+        _romaneios = await romaneio.get_multi_filters(
+            db=db,
+            filters=filters,
+            offset=offset,
+            limit=limit
+        ) if location_id != 0 or status else await romaneio.get_multi(db=db, skip=offset, limit=limit)
 
     # Normalizo a lista para o schema RomaneioListBase
     romaneio_response_list = []
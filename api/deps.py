@@ -1,6 +1,10 @@
 import logging
 from typing import AsyncGenerator, Generator
 
+import httpx
+
+from core.request import http_client_manager
+
 from db.session import SessionLocal_ag_ws
 from db.session import SessionLocal_211
 from db.session import SessionLocal_psql
@@ -14,6 +18,11 @@ async def get_db_psql() -> AsyncGenerator:
         await db.close()
 
 
+def get_http_client() -> httpx.AsyncClient:
+    """Cliente HTTP compartilhado (aberto no lifespan da aplicação)."""
+    return http_client_manager.client
+
+
 def get_db_211() -> Generator:
     try:
         db = SessionLocal_211()
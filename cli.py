@@ -0,0 +1,106 @@
+"""
+Comandos de manutenção da API de estoque.
+
+Uso:
+    python cli.py reconcile-summary          # só relata as divergências
+    python cli.py reconcile-summary --fix    # corrige o resumo a partir dos items
+    python cli.py import-stock estoque.csv --created-by USUARIO [--order-origin-id N] [--dry-run]
+"""
+import argparse
+import asyncio
+import logging
+from pathlib import Path
+from typing import AsyncIterator
+
+from core.logging_config import setup_logging
+from db.session import SessionLocal_psql
+from services.stock_import import StockImportService
+from services.stock_summary import stock_summary_service
+
+logger = logging.getLogger(__name__)
+
+
+async def reconcile_summary(fix: bool) -> int:
+    async with SessionLocal_psql() as db:
+        result = await stock_summary_service.reconcile(db=db, fix=fix)
+
+    for drift in result.drift:
+        print(
+            f"location={drift.location_id} stock_type={drift.stock_type!r} "
+            f"product={drift.product_id} ztipo={drift.ztipo!r} status={drift.status} "
+            f"esperado={drift.expected} atual={drift.actual}"
+        )
+    print(
+        f"{result.groups} grupos, {len(result.drift)} divergentes"
+        + (" (corrigidos)" if result.fixed else "")
+    )
+    # código de saída != 0 quando há divergência e nada foi corrigido (útil em cron/CI)
+    return 1 if result.drift and not result.fixed else 0
+
+
+async def _read_file(path: Path, chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+    with path.open("rb") as f:
+        while True:
+            chunk = await asyncio.to_thread(f.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+async def import_stock(path: Path, created_by: str, order_origin_id: int | None, dry_run: bool) -> int:
+    file_format = "jsonl" if path.suffix.lower() in (".jsonl", ".ndjson") else "csv"
+    service = StockImportService(
+        created_by=created_by, order_origin_id=order_origin_id, dry_run=dry_run)
+    async with SessionLocal_psql() as db:
+        result = await service.run(db=db, chunks=_read_file(path), format=file_format)
+
+    for reject in result.rejects:
+        print(f"linha={reject.line} serial={reject.serial!r} motivo={reject.reason}")
+    print(
+        f"{result.total} linhas, {result.imported} importadas, {result.rejected} recusadas"
+        + (" (simulação, nada foi gravado)" if result.dry_run else "")
+    )
+    return 1 if result.rejected else 0
+
+
+def main() -> int:
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Manutenção da API de estoque")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    reconcile = subparsers.add_parser(
+        "reconcile-summary",
+        help="Recalcula a posição de estoque consolidada e relata as divergências"
+    )
+    reconcile.add_argument(
+        "--fix", action="store_true",
+        help="Corrige o resumo com a contagem recalculada"
+    )
+
+    importer = subparsers.add_parser(
+        "import-stock",
+        help="Carga inicial de estoque a partir de um arquivo CSV ou JSONL"
+    )
+    importer.add_argument("path", type=Path, help="Arquivo .csv ou .jsonl")
+    importer.add_argument("--created-by", required=True,
+                          help="Usuário gravado nos movimentos de entrada")
+    importer.add_argument("--order-origin-id", type=int,
+                          help="Origem das linhas sem order_origin_id")
+    importer.add_argument("--dry-run", action="store_true",
+                          help="Valida e relata as recusas sem gravar nada")
+
+    args = parser.parse_args()
+    if args.command == "reconcile-summary":
+        return asyncio.run(reconcile_summary(fix=args.fix))
+    if args.command == "import-stock":
+        return asyncio.run(import_stock(
+            path=args.path,
+            created_by=args.created_by,
+            order_origin_id=args.order_origin_id,
+            dry_run=args.dry_run
+        ))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -86,6 +86,50 @@ class Settings(BaseSettings):
 
     TEMPO_URL: str = 'http://localhost:4317'
 
+    # Finalização assíncrona de romaneios (jobs em background)
+    ROMANEIO_FINISH_MAX_JOBS: int = 2
+    ROMANEIO_FINISH_CHUNK_SIZE: int = 200
+    ROMANEIO_FINISH_JOBS_HISTORY: int = 500
+    # segundos sem atualização (updated_at) para uma finalização 'EM PROCESSAMENTO'
+    # ser considerada interrompida e poder ser reassumida; deve passar com folga
+    # o tempo de um bloco de ROMANEIO_FINISH_CHUNK_SIZE itens
+    ROMANEIO_FINISH_CLAIM_TIMEOUT: int = 600
+
+    # Importação em massa de estoque (services/stock_import.py)
+    # linhas enviadas por COPY para a tabela de staging
+    STOCK_IMPORT_COPY_BATCH_SIZE: int = 10000
+    # recusas detalhadas no retorno (o total sempre é informado)
+    STOCK_IMPORT_MAX_REJECTS: int = 1000
+
+    # Cliente HTTP compartilhado (core/request.py)
+    SAP_SYNC_URL: str = 'http://192.168.0.214/IntegrationXmlAPI/api/v1/clo/sincrona/'
+    HTTP_TIMEOUT: float = 15.0
+    HTTP_CONNECT_TIMEOUT: float = 3.0
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    # limite de conexões simultâneas por host
+    HTTP_HOST_LIMITS: Dict[str, int] = {'192.168.0.214': 20}
+    # Circuit breaker por integração (core/request.py)
+    HTTP_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    HTTP_CIRCUIT_RECOVERY_TIMEOUT: float = 30.0
+    # orçamento de latência (timeout total em segundos) por integração
+    HTTP_LATENCY_BUDGETS: Dict[str, float] = {'sap_sync': 8.0}
+
+    # Cache da consulta síncrona (services/consulta_sincrona.py), TTLs em segundos
+    SAP_SYNC_CACHE_MAXSIZE: int = 5000
+    SAP_SYNC_CACHE_TTL: int = 300
+    # respostas com TYPE diferente de 'S' (serial não encontrado, erro no SAP)
+    SAP_SYNC_CACHE_ERROR_TTL: int = 30
+    # TTL por status do equipamento (STTXT), sobrepõe o padrão
+    SAP_SYNC_CACHE_TTL_BY_STATUS: Dict[str, int] = {}
+    # consultas simultâneas no SAP em ConsultaSincrona.executar_many
+    SAP_SYNC_MAX_CONCURRENCY: int = 10
+
+    # Cache das tabelas de referência: clientes e origens (crud/reference_cache.py)
+    REFERENCE_CACHE_MAXSIZE: int = 1000
+    REFERENCE_CACHE_TTL: int = 600
+
     EVENTS_INTELIPOST: dict = {
         '200': 'Recebido para Picking',
         '201': 'PCP',
@@ -1,6 +1,8 @@
 import logging
 import sys
 import json
+from contextvars import ContextVar
+from typing import List, Optional
 from pythonjsonlogger import jsonlogger
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
@@ -18,12 +20,24 @@ def setup_logging():
     logger.setLevel(logging.INFO)
 
 
+# Contador de comandos SQL da requisição atual (incrementado pelo evento
+# before_cursor_execute do engine em db/session.py). Lista mutável para que o
+# valor incrementado nas tasks filhas seja visto pelo middleware.
+sql_query_count: ContextVar[Optional[List[int]]] = ContextVar(
+    "sql_query_count", default=None)
+
+
 class RequestLoggingMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
         logger = logging.getLogger("http")
         start_time = time.time()
+        queries = [0]
+        token = sql_query_count.set(queries)
 
-        response = await call_next(request)
+        try:
+            response = await call_next(request)
+        finally:
+            sql_query_count.reset(token)
         duration = time.time() - start_time
 
         logger.info("Request",
@@ -31,7 +45,8 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
                         "method": request.method,
                         "url": request.url.path,
                         "status": response.status_code,
-                        "duration_ms": round(duration * 1000)
+                        "duration_ms": round(duration * 1000),
+                        "sql_queries": queries[0]
                     })
 
         return response
@@ -1,7 +1,12 @@
 import logging
+import time
+from typing import Any, Dict, Optional
+
 import httpx
 from opentelemetry.propagate import inject
 
+from core.config import settings
+
 logger = logging.getLogger()
 
 
@@ -11,13 +16,176 @@ async def log_request_result(prefix, endpoint, method, request_data, res):
     )
 
 
+class HttpClientManager:
+    """
+    Cliente httpx compartilhado pela aplicação inteira (pool de conexões com keep-alive).
+
+    Aberto/fechado no lifespan do FastAPI (main.py). Fora da API (jobs, cli) o
+    cliente é criado sob demanda no primeiro uso.
+    Limites por host vêm de settings.HTTP_HOST_LIMITS ({"host": max_conexoes}).
+    """
+
+    def __init__(self) -> None:
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _build_client(self) -> httpx.AsyncClient:
+        mounts = {
+            f"all://{host}": httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                    keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+                )
+            )
+            for host, max_connections in settings.HTTP_HOST_LIMITS.items()
+        }
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.HTTP_TIMEOUT,
+                                  connect=settings.HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+            ),
+            mounts=mounts,
+        )
+
+    async def start(self) -> None:
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+            logger.info("Cliente HTTP compartilhado iniciado")
+
+    async def stop(self) -> None:
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+            logger.info("Cliente HTTP compartilhado finalizado")
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+
+
+http_client_manager = HttpClientManager()
+
+
+class CircuitOpenError(Exception):
+    """Chamada recusada sem ir à rede porque o circuito da integração está aberto."""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker de uma integração externa.
+
+    - closed: chamadas passam; falhas consecutivas (timeout, erro de conexão, 5xx)
+      acima de failure_threshold abrem o circuito
+    - open: chamadas falham na hora com CircuitOpenError até recovery_timeout
+    - half_open: libera uma chamada de teste; sucesso fecha o circuito, falha reabre
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int, recovery_timeout: float) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == self.OPEN or (state == self.HALF_OPEN and self._probe_in_flight):
+            self.rejected += 1
+            raise CircuitOpenError(
+                f"Integração '{self.name}' indisponível (circuito aberto)")
+        if state == self.HALF_OPEN:
+            self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        if self._state != self.CLOSED:
+            logger.info(f"Circuito '{self.name}' fechado")
+        self._state = self.CLOSED
+        self._failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                logger.warning(
+                    f"Circuito '{self.name}' aberto após {self._failures} falha(s)")
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def release(self) -> None:
+        self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "rejected": self.rejected,
+        }
+
+
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    if name not in _circuit_breakers:
+        _circuit_breakers[name] = CircuitBreaker(
+            name=name,
+            failure_threshold=settings.HTTP_CIRCUIT_FAILURE_THRESHOLD,
+            recovery_timeout=settings.HTTP_CIRCUIT_RECOVERY_TIMEOUT,
+        )
+    return _circuit_breakers[name]
+
+
+def _is_breaker_failure(exc: Exception) -> bool:
+    """Timeouts, erros de transporte e 5xx contam como falha; 4xx não."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
 class RequestClient:
-    def __init__(self, method, url: str, headers, request_data: dict = None, timeout: int = 100) -> None:
+    def __init__(
+        self,
+        method,
+        url: str,
+        headers,
+        request_data: dict = None,
+        timeout: Optional[float] = None,
+        client: Optional[httpx.AsyncClient] = None,
+        breaker: Optional[str] = None
+    ) -> None:
         self.method = method
         self.url = url
         self.request_data = request_data
         self.headers = headers
+        # breaker: nome da integração; liga o circuit breaker e usa o orçamento
+        # de latência dela (settings.HTTP_LATENCY_BUDGETS) como timeout
+        self.breaker = get_circuit_breaker(breaker) if breaker else None
+        if timeout is None and breaker:
+            timeout = settings.HTTP_LATENCY_BUDGETS.get(breaker)
+        # None usa o timeout padrão do cliente compartilhado
         self.timeout = timeout
+        self.client = client or http_client_manager.client
         inject(carrier=self.headers)
 
     async def send_api_request(self):
@@ -25,16 +193,42 @@ class RequestClient:
         logger.info(f"Request body/params: {self.request_data}")
         logger.info(f"Request HEADERS: {self.headers}")
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            try:
-                request = httpx.Request(self.method.upper(), url=self.url,
-                                        **{f"{'params' if self.method == 'get' else 'json'}": self.request_data},
-                                        headers=self.headers)
-                response = await client.send(request)
-                response.raise_for_status()
-            except httpx.HTTPStatusError as exc:
-                await log_request_result('request_error', self.url, self.method, self.request_data, response)
-                raise exc
-
-            await log_request_result('request_success', self.url, self.method, self.request_data, response)
-            return response.json()
+        if self.breaker:
+            self.breaker.before_call()
+
+        # recorded: a chamada já registrou sucesso/falha no breaker; qualquer
+        # outra saída (inclusive CancelledError, que é BaseException) libera a
+        # chamada de teste do half-open no finally
+        recorded = False
+        try:
+            request = self.client.build_request(
+                self.method.upper(), url=self.url,
+                **{f"{'params' if self.method == 'get' else 'json'}": self.request_data},
+                headers=self.headers,
+                timeout=self.timeout if self.timeout is not None else httpx.USE_CLIENT_DEFAULT)
+            response = await self.client.send(request)
+            response.raise_for_status()
+        except httpx.HTTPStatusError as exc:
+            if self.breaker:
+                if _is_breaker_failure(exc):
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                recorded = True
+            await log_request_result('request_error', self.url, self.method, self.request_data, response)
+            raise exc
+        except Exception as exc:
+            if self.breaker and _is_breaker_failure(exc):
+                self.breaker.record_failure()
+                recorded = True
+            raise
+        else:
+            if self.breaker:
+                self.breaker.record_success()
+                recorded = True
+        finally:
+            if self.breaker and not recorded:
+                self.breaker.release()
+
+        await log_request_result('request_success', self.url, self.method, self.request_data, response)
+        return response.json()
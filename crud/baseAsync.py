@@ -1,14 +1,21 @@
+import base64
+import json
 import logging
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, Generic, List, Optional, Tuple, Type, TypeVar, Union
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.orm import raiseload
 from sqlalchemy import desc, and_
 from db.base_class import Base
 from sqlalchemy import func, select,  cast
-from sqlalchemy.types import Numeric
+from sqlalchemy import insert, update, values, column, bindparam, tuple_, literal_column
+from sqlalchemy.types import DateTime, Numeric
 from sqlalchemy.dialects.postgresql import JSON, JSONB
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.sql.elements import ColumnElement
 from sqlalchemy.exc import IntegrityError
 from asyncpg.exceptions import UniqueViolationError
@@ -62,7 +69,8 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         self,
         stmt,
         dotted_field: str,
-        join_tracker: Dict[str, bool]
+        join_tracker: Dict[str, bool],
+        outer: bool = False
     ):
         """
         Resolve:
@@ -71,6 +79,8 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         - json_field.chave.subchave
 
         SEMPRE mantém current_model como classe de modelo.
+        outer=True usa LEFT OUTER JOIN nas relações ainda não "joinadas"
+        (útil para colunas de saída, que não devem filtrar linhas).
         """
 
         parts = dotted_field.split(".")
@@ -133,7 +143,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             path_key = ".".join(path_accum)
 
             if not join_tracker.get(path_key):
-                stmt = stmt.join(getattr(current_model, part))
+                stmt = stmt.join(getattr(current_model, part), isouter=outer)
                 join_tracker[path_key] = True
 
             # 🔑 SEMPRE usar a classe do relacionamento
@@ -207,6 +217,96 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         "max": func.max,
     }
 
+    # ----------------------
+    # Cache de statements
+    # ----------------------
+    # Os filtros de cada endpoint têm formato fixo (mesmos campos, operadores e ordem),
+    # só os valores mudam. O statement é montado uma vez com bind params (f_0, f_1, ...)
+    # e reaproveitado; o SQLAlchemy também reaproveita o SQL compilado.
+    _stmt_cache: "OrderedDict[tuple, Any]" = OrderedDict()
+    _STMT_CACHE_SIZE = 512
+
+    # Perfis de carga dos relacionamentos (parâmetro load= dos GETs):
+    # - None / "full": mantém o lazy definido no model (comportamento atual)
+    # - "minimal": só as colunas da própria tabela; acessar um relacionamento levanta erro
+    # - demais perfis (ex.: "listing"): registrados por cada CRUD em load_profiles,
+    #   nome -> função que devolve as options (selectinload/raiseload/load_only)
+    load_profiles: Dict[str, Callable[[], List[Any]]] = {}
+
+    def _load_options(self, load: Optional[str]) -> List[Any]:
+        if load is None or load == "full":
+            return []
+        if load == "minimal":
+            return [raiseload("*")]
+        profile = self.load_profiles.get(load)
+        if profile is None:
+            raise ValueError(
+                f"Perfil de carga '{load}' não existe para {self.model.__name__}")
+        return profile()
+
+    def _with_load(self, stmt, load: Optional[str]):
+        options = self._load_options(load)
+        return stmt.options(*options) if options else stmt
+
+    def _cached_stmt(self, key: tuple, builder: Callable[[], Any]):
+        key = (self.model,) + key
+        stmt = self._stmt_cache.get(key)
+        if stmt is not None:
+            self._stmt_cache.move_to_end(key)
+            return stmt
+
+        stmt = builder()
+        self._stmt_cache[key] = stmt
+        if len(self._stmt_cache) > self._STMT_CACHE_SIZE:
+            self._stmt_cache.popitem(last=False)
+        return stmt
+
+    def _filter_conditions(
+        self,
+        stmt,
+        shape: Tuple[Tuple[str, str], ...],
+        join_tracker: Dict[str, bool]
+    ):
+        """
+        Monta as condições com bind params a partir do formato dos filtros:
+        ((campo, operador), ...). O valor do filtro idx vai no param f_{idx}.
+        """
+        conditions = []
+        for idx, (field, op) in enumerate(shape):
+            if op not in self._OP:
+                raise ValueError(f"Operador '{op}' não suportado.")
+
+            stmt, attr = self._resolve_and_join(stmt, field, join_tracker)
+            param = bindparam(f"f_{idx}", expanding=op in ("in", "notin"))
+            conditions.append(self._OP[op](attr, param))
+        return stmt, conditions
+
+    def _filter_params(self, filters: List[Tuple[str, str, Any]]) -> Dict[str, Any]:
+        """Valores dos filtros ((campo, operador, valor), ...) para os bind params."""
+        params: Dict[str, Any] = {}
+        for idx, (field, op, value) in enumerate(filters):
+            if op in ("is_null", "is_not_null"):
+                continue
+            if op in ("in", "notin"):
+                if not isinstance(value, (list, tuple, set)):
+                    raise ValueError(f"Operador '{op}' exige lista/tupla.")
+                value = list(value)
+            params[f"f_{idx}"] = self._normalize_like(op, value)
+        return params
+
+    def _filter_op(self, op: str, value: Any) -> str:
+        """
+        Valor None em =/==/!= vira IS NULL/IS NOT NULL (como no SQLAlchemy com
+        literal). Entra no formato dos filtros, então também na chave do cache.
+        """
+        if value is None and op in ("=", "==", "!="):
+            return "is_not_null" if op == "!=" else "is_null"
+        return op
+
+    def _filters_as_tuples(self, filters: Optional[List[Dict[str, Any]]]) -> List[Tuple[str, str, Any]]:
+        return [(f["field"], self._filter_op(f.get("operator", "="), f.get("value")), f.get("value"))
+                for f in filters or []]
+
     async def get_aggregates(
         self,
         db: AsyncSession,
@@ -214,92 +314,122 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         filters: Optional[List[Dict[str, Any]]] = None,
         aggregations: List[Dict[str, Any]],
         group_by: Optional[List[str]] = None,
+        grouping_sets: Optional[List[List[str]]] = None,
     ) -> List[Dict[str, Any]]:
+        """
+        Agregações com filtros dinâmicos.
+
+        grouping_sets permite calcular vários níveis de agrupamento numa
+        única consulta (GROUP BY GROUPING SETS), ex.:
+            [["location.cod_iata"], ["location.cod_iata", "product.sku"]]
+        As colunas de todos os conjuntos entram no retorno (as que não fazem
+        parte do conjunto da linha vêm como None) e cada linha traz a chave
+        "grouping_set" com o índice do conjunto a que pertence.
+        """
+        _filters = self._filters_as_tuples(filters)
+        shape = tuple((field, op) for field, op, _ in _filters)
+        aggs = tuple(
+            (agg["op"], agg["field"], agg.get("alias", f'{agg["op"]}_{agg["field"]}'),
+             agg.get("is_json", False))
+            for agg in aggregations
+        )
+        groups = tuple(group_by or [])
+        sets = tuple(tuple(gs) for gs in grouping_sets or [])
+        if sets:
+            # colunas dos conjuntos que não vieram no group_by entram no final
+            groups += tuple(dict.fromkeys(
+                gb for gs in sets for gb in gs if gb not in groups))
+
+        def builder():
+            join_tracker: Dict[str, bool] = {}
+            stmt = select()
+            select_columns = []
+            group_columns = []
+
+            # ==========================
+            # AGGREGATIONS
+            # ==========================
+            for op, field, alias, is_json in aggs:
+                if op not in self._AGG_OP:
+                    raise ValueError(f"Agregação '{op}' não suportada.")
 
-        join_tracker: Dict[str, bool] = {}
-        stmt = select()
-        select_columns = []
-        group_columns = []
-
-        # ==========================
-        # AGGREGATIONS
-        # ==========================
-        for agg in aggregations:
-            op = agg["op"]
-            field = agg["field"]
-            alias = agg.get("alias", f"{op}_{field}")
-            is_json = agg.get("is_json", False)
-
-            if op not in self._AGG_OP:
-                raise ValueError(f"Agregação '{op}' não suportada.")
-
-            stmt, attr = self._resolve_and_join(stmt, field, join_tracker)
-
-            if is_json:
-                # JSON → cast para número
-                attr = cast(attr.astext, Numeric)
-
-            select_columns.append(
-                self._AGG_OP[op](attr).label(alias)
-            )
-
-        # ==========================
-        # GROUP BY
-        # ==========================
-        if group_by:
-            for gb in group_by:
-                stmt, gb_attr = self._resolve_and_join(stmt, gb, join_tracker)
-                label = gb.split(".")[-1]  # ZTIPO
-                group_columns.append(gb_attr)
-                select_columns.append(gb_attr.label(label))
-
-            stmt = stmt.group_by(*group_columns)
-
-        stmt = stmt.with_only_columns(*select_columns)
-
-        # ==========================
-        # FILTERS (reaproveita padrão)
-        # ==========================
-        conditions = []
-        if filters:
-            for f in filters:
-                field = f["field"]
-                op = f.get("operator", "=")
-                value = f["value"]
-
-                if op not in self._OP:
-                    raise ValueError(f"Operador '{op}' não suportado.")
-
-                value = self._normalize_like(op, value)
                 stmt, attr = self._resolve_and_join(stmt, field, join_tracker)
 
-                conditions.append(self._OP[op](attr, value))
+                if is_json:
+                    # JSON → cast para número
+                    attr = cast(attr.astext, Numeric)
 
-        if conditions:
-            stmt = stmt.where(and_(*conditions))
+                select_columns.append(
+                    self._AGG_OP[op](attr).label(alias)
+                )
+
+            # ==========================
+            # GROUP BY
+            # ==========================
+            if groups:
+                for gb in groups:
+                    stmt, gb_attr = self._resolve_and_join(
+                        stmt, gb, join_tracker)
+                    label = gb.split(".")[-1]  # ZTIPO
+                    group_columns.append(gb_attr)
+                    select_columns.append(gb_attr.label(label))
+
+                if sets:
+                    stmt = stmt.group_by(func.grouping_sets(*[
+                        tuple_(*[group_columns[groups.index(gb)] for gb in gs])
+                        for gs in sets
+                    ]))
+                    # bitmask do GROUPING(): bit ligado = coluna fora do conjunto
+                    select_columns.append(
+                        func.grouping(*group_columns).label("_grouping"))
+                else:
+                    stmt = stmt.group_by(*group_columns)
+
+            stmt = stmt.with_only_columns(*select_columns)
+
+            # ==========================
+            # FILTERS (reaproveita padrão)
+            # ==========================
+            stmt, conditions = self._filter_conditions(
+                stmt, shape, join_tracker)
+            if conditions:
+                stmt = stmt.where(and_(*conditions))
+            return stmt
+
+        stmt = self._cached_stmt(
+            ("aggregates", aggs, groups, sets, shape), builder)
 
         # ==========================
         # EXEC
         # ==========================
-        result = await db.execute(stmt)
-
-        rows = result.mappings().all()
-        return [dict(row) for row in rows]
+        result = await db.execute(stmt, self._filter_params(_filters))
+
+        rows = [dict(row) for row in result.mappings().all()]
+        if sets:
+            masks = {
+                sum(1 << (len(groups) - 1 - i)
+                    for i, gb in enumerate(groups) if gb not in gs): idx
+                for idx, gs in enumerate(sets)
+            }
+            for row in rows:
+                row["grouping_set"] = masks[row.pop("_grouping")]
+        return rows
 
     # ----------------------
     # GETs adaptados
     # ----------------------
-    async def get(self, db: AsyncSession, id: Any) -> Optional[ModelType]:
-        stmt = select(self.model).filter(self.model.id == id)
+    async def get(self, db: AsyncSession, id: Any, load: Optional[str] = None) -> Optional[ModelType]:
+        stmt = self._with_load(select(self.model), load).filter(self.model.id == id)
         result = await db.execute(stmt)
         # não precisa de join; mas unique() é inofensivo
         return result.scalars().unique().first()
 
     async def get_first_by_filter(
-        self, db: AsyncSession, *, order_by: str = "id", filterby: str = "enviado", filter: str
+        self, db: AsyncSession, *, order_by: str = "id", filterby: str = "enviado", filter: str,
+        load: Optional[str] = None
     ) -> Optional[ModelType]:
         join_tracker: Dict[str, bool] = {}
-        stmt = select(self.model)
+        stmt = self._with_load(select(self.model), load)
 
         # WHERE
         stmt, where_attr = self._resolve_and_join(stmt, filterby, join_tracker)
@@ -313,10 +443,11 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         return result.scalars().unique().first()
 
     async def get_multi(
-        self, db: AsyncSession, *, skip: int = 0, limit: int = 100, order_by: str = "id"
+        self, db: AsyncSession, *, skip: int = 0, limit: int = 100, order_by: str = "id",
+        load: Optional[str] = None
     ) -> List[ModelType]:
         join_tracker: Dict[str, bool] = {}
-        stmt = select(self.model)
+        stmt = self._with_load(select(self.model), load)
 
         # ORDER BY (suporta relação)
         stmt, order_attr = self._resolve_and_join(stmt, order_by, join_tracker)
@@ -326,10 +457,11 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         return result.scalars().unique().all()
 
     async def get_multi_filter(
-        self, db: AsyncSession, *, order_by: str = "id", filterby: str = "enviado", filter: str
+        self, db: AsyncSession, *, order_by: str = "id", filterby: str = "enviado", filter: str,
+        load: Optional[str] = None
     ) -> List[ModelType]:
         join_tracker: Dict[str, bool] = {}
-        stmt = select(self.model)
+        stmt = self._with_load(select(self.model), load)
 
         # WHERE
         stmt, where_attr = self._resolve_and_join(stmt, filterby, join_tracker)
@@ -352,57 +484,52 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         limit: Optional[int] = None,
         offset: Optional[int] = None,
         distinct_on_id: bool = False,
+        load: Optional[str] = None,
     ) -> List[ModelType]:
-        join_tracker: Dict[str, bool] = {}
-        stmt = select(self.model)
-
-        conditions = []
-        for f in filters:
-            field = f["field"]
-            op = f.get("operator", "=")
-            value = f["value"]
-
-            if op not in self._OP:
-                raise ValueError(f"Operador '{op}' não suportado.")
-
-            value = self._normalize_like(op, value)
-            stmt, attr = self._resolve_and_join(stmt, field, join_tracker)
-
-            if op in ("in", "notin") and not isinstance(value, (list, tuple, set)):
-                raise ValueError(f"Operador '{op}' exige lista/tupla.")
-
-            conditions.append(self._OP[op](attr, value))
-
-        if conditions:
-            stmt = stmt.where(and_(*conditions))
-
-        # ORDER BY
-        order_clause = None
-        if order_by:
-            stmt, order_attr = self._resolve_and_join(
-                stmt, order_by, join_tracker)
-            order_clause = order_attr.desc() if order_desc else order_attr.asc()
-
-        if distinct_on_id:
-            stmt = stmt.distinct(self.model.id)
-            if order_clause is not None:
-                stmt = stmt.order_by(self.model.id, order_clause)
+        _filters = self._filters_as_tuples(filters)
+        shape = tuple((field, op) for field, op, _ in _filters)
+
+        def builder():
+            join_tracker: Dict[str, bool] = {}
+            stmt = self._with_load(select(self.model), load)
+
+            stmt, conditions = self._filter_conditions(
+                stmt, shape, join_tracker)
+            if conditions:
+                stmt = stmt.where(and_(*conditions))
+
+            # ORDER BY
+            order_clause = None
+            if order_by:
+                stmt, order_attr = self._resolve_and_join(
+                    stmt, order_by, join_tracker)
+                order_clause = order_attr.desc() if order_desc else order_attr.asc()
+
+            if distinct_on_id:
+                stmt = stmt.distinct(self.model.id)
+                if order_clause is not None:
+                    stmt = stmt.order_by(self.model.id, order_clause)
+                else:
+                    stmt = stmt.order_by(self.model.id)
             else:
-                stmt = stmt.order_by(self.model.id)
-        else:
-            if order_clause is not None:
-                stmt = stmt.order_by(order_clause)
+                if order_clause is not None:
+                    stmt = stmt.order_by(order_clause)
+            return stmt
+
+        stmt = self._cached_stmt(
+            ("multi_filters", shape, order_by, order_desc, distinct_on_id, load), builder)
 
         if offset:
             stmt = stmt.offset(offset)
         if limit:
             stmt = stmt.limit(limit)
 
-        result = await db.execute(stmt)
+        result = await db.execute(stmt, self._filter_params(_filters))
         return result.scalars().unique().all()
 
     async def get_last_by_filters(
-        self, db: AsyncSession, *, filters: Dict[str, Dict[str, Union[str, int]]]
+        self, db: AsyncSession, *, filters: Dict[str, Dict[str, Union[str, int]]],
+        load: Optional[str] = None, refresh: bool = False
     ) -> Optional[ModelType]:
         """
         filters esperado:
@@ -410,47 +537,251 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
           "status": {"operator": "==", "value": "IN_DEPOT"},
           "product.client_name": {"operator": "ilike", "value": "cielo"}
         }
-        """
-        join_tracker: Dict[str, bool] = {}
-        stmt = select(self.model)
 
-        conditions = []
+        refresh=True sobrescreve o objeto que já estiver na sessão com o que
+        veio do banco (populate_existing, na mesma query). Só é necessário
+        quando a linha foi alterada na sessão por UPDATE direto (fora do ORM).
+        """
+        _filters = []
         for field, condition in filters.items():
             op = condition["operator"]
             op = '=' if op == '==' else op
-            value = condition.get("value")
+            op = self._filter_op(op, condition.get("value"))
+            _filters.append((field, op, condition.get("value")))
+        shape = tuple((field, op) for field, op, _ in _filters)
 
-            if op not in self._OP:
-                raise ValueError(f"Operador '{op}' não suportado.")
+        def builder():
+            join_tracker: Dict[str, bool] = {}
+            stmt = self._with_load(select(self.model), load)
 
-            value = self._normalize_like(op, value)
-            stmt, attr = self._resolve_and_join(stmt, field, join_tracker)
+            stmt, conditions = self._filter_conditions(
+                stmt, shape, join_tracker)
+            if conditions:
+                stmt = stmt.where(and_(*conditions))
 
-            if op in ("in", "notin") and not isinstance(value, (list, tuple, set)):
-                raise ValueError(
-                    f"Operador '{op}' exige lista/tupla de valores.")
+            # último por id desc
+            return stmt.order_by(desc(self.model.id)).limit(1)
 
-            conditions.append(self._OP[op](attr, value))
+        stmt = self._cached_stmt(("last_by_filters", shape, load), builder)
 
-        if conditions:
-            stmt = stmt.where(and_(*conditions))
+        if refresh:
+            stmt = stmt.execution_options(populate_existing=True)
 
-        # último por id desc
-        stmt = stmt.order_by(desc(self.model.id))
+        result = await db.execute(stmt, self._filter_params(_filters))
+        return result.scalars().unique().first()
 
-        result = await db.execute(stmt)
-        obj = result.scalars().unique().first()
-        if obj:
-            await db.refresh(obj)
-        return obj
+    # ----------------------
+    # Paginação por cursor (keyset)
+    # ----------------------
+    def _encode_cursor(self, key_values: List[Any]) -> str:
+        raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v
+                          for v in key_values])
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def _decode_cursor(self, cursor: str, key_attrs: List[Any]) -> List[Any]:
+        try:
+            raw = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            if not isinstance(raw, list) or len(raw) != len(key_attrs):
+                raise ValueError
+            return [datetime.fromisoformat(v) if isinstance(attr.type, DateTime) else v
+                    for v, attr in zip(raw, key_attrs)]
+        except Exception:
+            raise ValueError("Cursor inválido.")
+
+    async def get_multi_keyset(
+        self,
+        db: AsyncSession,
+        *,
+        filters: Optional[List[Dict[str, Any]]] = None,
+        order_by: str = "id",
+        order_desc: bool = False,
+        after: Optional[str] = None,
+        limit: int = 100,
+        load: Optional[str] = None,
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        """
+        Paginação por cursor: WHERE (order_by, id) > / < (valores do cursor) + LIMIT.
+        Cada página custa o mesmo, independente da profundidade (sem OFFSET).
+
+        order_by precisa ser coluna do próprio model; o id entra como desempate.
+        Retorna (itens, next_cursor). next_cursor é None na última página.
+        """
+        if order_by not in self.model.__mapper__.column_attrs.keys():
+            raise ValueError(
+                f"Coluna de ordenação '{order_by}' não existe em {self.model.__name__}.")
+        _filters = self._filters_as_tuples(filters)
+        shape = tuple((field, op) for field, op, _ in _filters)
+        key_attrs = [getattr(self.model, order_by)]
+        if order_by != "id":
+            key_attrs.append(self.model.id)
+
+        def builder():
+            join_tracker: Dict[str, bool] = {}
+            stmt = self._with_load(select(self.model), load)
+
+            stmt, conditions = self._filter_conditions(
+                stmt, shape, join_tracker)
+            if after:
+                cursor_params = tuple_(*[bindparam(f"k_{idx}", type_=attr.type)
+                                         for idx, attr in enumerate(key_attrs)])
+                keys = tuple_(*key_attrs)
+                conditions.append(
+                    keys < cursor_params if order_desc else keys > cursor_params)
+            if conditions:
+                stmt = stmt.where(and_(*conditions))
+
+            return stmt.order_by(
+                *[attr.desc() if order_desc else attr.asc() for attr in key_attrs])
+
+        stmt = self._cached_stmt(
+            ("keyset", shape, order_by, order_desc, bool(after), load), builder)
+
+        params = self._filter_params(_filters)
+        if after:
+            for idx, value in enumerate(self._decode_cursor(after, key_attrs)):
+                params[f"k_{idx}"] = value
+
+        # busca 1 a mais para saber se existe próxima página
+        result = await db.execute(stmt.limit(limit + 1), params)
+        objs = result.scalars().unique().all()
+
+        next_cursor = None
+        if len(objs) > limit:
+            objs = objs[:limit]
+            last = objs[-1]
+            next_cursor = self._encode_cursor(
+                [getattr(last, attr.key) for attr in key_attrs])
+        return objs, next_cursor
+
+    def _columns_stmt(
+        self,
+        shape: Tuple[Tuple[str, str], ...],
+        columns: Tuple[str, ...],
+        order_by: Optional[str] = None,
+        order_desc: bool = False,
+        distinct_on: Optional[str] = None,
+        lock: bool = False,
+    ):
+        def builder():
+            join_tracker: Dict[str, bool] = {}
+            stmt = select(self.model)
+
+            stmt, conditions = self._filter_conditions(
+                stmt, shape, join_tracker)
+
+            # colunas depois dos filtros: relações novas entram como LEFT JOIN
+            select_columns = []
+            for col in columns:
+                stmt, attr = self._resolve_and_join(
+                    stmt, col, join_tracker, outer=True)
+                select_columns.append(attr.label(col.replace(".", "_")))
+
+            stmt = stmt.with_only_columns(*select_columns)
+            if conditions:
+                stmt = stmt.where(and_(*conditions))
+
+            if distinct_on:
+                # DISTINCT ON exige a coluna como primeira do ORDER BY
+                stmt, distinct_attr = self._resolve_and_join(
+                    stmt, distinct_on, join_tracker, outer=True)
+                stmt = stmt.distinct(distinct_attr).order_by(distinct_attr)
+
+            if order_by:
+                stmt, order_attr = self._resolve_and_join(
+                    stmt, order_by, join_tracker, outer=True)
+                # id como desempate para a ordem ser estável
+                if order_desc:
+                    stmt = stmt.order_by(order_attr.desc(), self.model.id.desc())
+                else:
+                    stmt = stmt.order_by(order_attr.asc(), self.model.id.asc())
+
+            if lock:
+                # FOR UPDATE OF só na tabela do model (as relações entram como
+                # LEFT JOIN); ordem por id para transações concorrentes travarem
+                # as linhas na mesma sequência
+                if not order_by and not distinct_on:
+                    stmt = stmt.order_by(self.model.id)
+                stmt = stmt.with_for_update(of=self.model)
+            return stmt
+
+        return self._cached_stmt(
+            ("multi_columns", columns, shape, order_by, order_desc, distinct_on, lock), builder)
+
+    async def get_multi_columns(
+        self,
+        db: AsyncSession,
+        *,
+        filters: List[Dict[str, Any]],
+        columns: List[str],
+        order_by: Optional[str] = None,
+        order_desc: bool = False,
+        distinct_on: Optional[str] = None,
+        lock: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Igual ao get_multi_filters, mas retorna somente as colunas pedidas
+        (sem montar objetos ORM e sem disparar os eager loads do model).
+
+        columns aceita o mesmo formato dos filtros ("campo" ou "rel.campo").
+        A chave de cada coluna no retorno é o caminho com "." trocado por "_".
+
+        distinct_on devolve uma linha por valor da coluna (DISTINCT ON), a
+        primeira segundo order_by; ex.: último movimento de cada item com
+        distinct_on="item_id", order_by="id", order_desc=True.
+
+        lock=True trava as linhas do model lidas (SELECT ... FOR UPDATE OF)
+        até o fim da transação do chamador.
+        """
+        _filters = self._filters_as_tuples(filters)
+        shape = tuple((field, op) for field, op, _ in _filters)
+        stmt = self._columns_stmt(
+            shape, tuple(columns), order_by, order_desc, distinct_on, lock)
+
+        result = await db.execute(stmt, self._filter_params(_filters))
+        return [dict(row) for row in result.mappings().all()]
+
+    async def stream_columns(
+        self,
+        db: AsyncSession,
+        *,
+        filters: List[Dict[str, Any]],
+        columns: List[str],
+        order_by: Optional[str] = None,
+        order_desc: bool = False,
+        limit: Optional[int] = None,
+        yield_per: int = 1000,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Versão em streaming do get_multi_columns: usa cursor no servidor e
+        busca as linhas em blocos de yield_per, mantendo a memória constante
+        independente do tamanho do resultado. Usado nos exports.
+        """
+        _filters = self._filters_as_tuples(filters)
+        shape = tuple((field, op) for field, op, _ in _filters)
+        stmt = self._columns_stmt(shape, tuple(columns), order_by, order_desc)
+        if limit:
+            stmt = stmt.limit(limit)
+
+        result = await db.stream(
+            stmt.execution_options(yield_per=yield_per),
+            self._filter_params(_filters),
+        )
+        async for partition in result.mappings().partitions():
+            for row in partition:
+                yield dict(row)
 
     # ----------------------
-    # CRUD write (inalterado)
+    # CRUD write
     # ----------------------
-    async def create(self, db: AsyncSession, *, obj_in: CreateSchemaType) -> ModelType:
+    # commit=False: só faz flush (gera ids e valida constraints) dentro da
+    # transação do chamador, que faz um único commit no fim da unidade de trabalho
+    async def create(self, db: AsyncSession, *, obj_in: CreateSchemaType, commit: bool = True) -> ModelType:
         obj_data = obj_in.model_dump()
         db_obj = self.model(**obj_data)  # type: ignore
         db.add(db_obj)
+        if not commit:
+            await db.flush()
+            return db_obj
         await self._commit_with_retry(db)
         await db.refresh(db_obj)
         return db_obj
@@ -469,17 +800,138 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
 
         return {"msg": "Objetos criados com sucesso"}
 
+    async def create_multi_returning(
+        self,
+        db: AsyncSession,
+        *,
+        rows: List[Dict[str, Any]],
+        returning: Optional[List[str]] = None,
+        commit: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        INSERT multi-linha (um único statement) com RETURNING.
+
+        Todas as linhas precisam ter as mesmas chaves. Retorna as colunas de
+        `returning` (default: id) de cada linha inserida.
+        Com commit=False o chamador controla a transação.
+        """
+        if not rows:
+            return []
+
+        table = self.model.__table__
+        returning = returning or ["id"]
+        stmt = insert(table).values(rows).returning(
+            *[table.c[col] for col in returning])
+
+        result = await db.execute(stmt)
+        created = [dict(row) for row in result.mappings().all()]
+
+        if commit:
+            await self._commit_with_retry(db)
+        return created
+
+    async def upsert(
+        self,
+        db: AsyncSession,
+        *,
+        obj_in: Union[CreateSchemaType, Dict[str, Any]],
+        conflict: List[str],
+        update_fields: Optional[List[str]] = None,
+        commit: bool = True
+    ) -> Tuple[ModelType, bool]:
+        """
+        INSERT ... ON CONFLICT (conflict) ... RETURNING.
+
+        Retorna (objeto, created).
+        - Com update_fields: DO UPDATE desses campos; created vem de xmax = 0
+          (linha inserida, não atualizada).
+        - Sem update_fields: DO NOTHING, então um registro existente não é
+          reescrito nem fica travado até o commit; se o INSERT não devolver
+          linha, o registro existente é lido pela chave (created=False).
+        Seguro com requisições simultâneas para a mesma chave.
+        """
+        data = obj_in if isinstance(obj_in, dict) else obj_in.model_dump()
+        stmt = pg_insert(self.model).values(**data)
+
+        if update_fields:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=conflict,
+                set_={field: stmt.excluded[field] for field in update_fields}
+            ).returning(self.model, literal_column("xmax = 0").label("created"))
+            result = await db.execute(
+                stmt, execution_options={"populate_existing": True})
+            db_obj, created = result.one()
+        else:
+            result = await db.execute(
+                stmt.on_conflict_do_nothing(index_elements=conflict).returning(self.model),
+                execution_options={"populate_existing": True})
+            db_obj = result.scalar_one_or_none()
+            created = db_obj is not None
+            if db_obj is None:
+                result = await db.execute(
+                    select(self.model).where(
+                        *[getattr(self.model, field) == data[field] for field in conflict]),
+                    execution_options={"populate_existing": True})
+                db_obj = result.scalars().first()
+
+        if commit:
+            await self._commit_with_retry(db)
+        return db_obj, created
+
+    async def update_multi_by_id(
+        self,
+        db: AsyncSession,
+        *,
+        rows: List[Dict[str, Any]],
+        commit: bool = True
+    ) -> int:
+        """
+        UPDATE set-based: um único UPDATE ... FROM (VALUES ...) para todas as linhas.
+
+        Cada dict precisa ter a chave `id` e todas as linhas as mesmas chaves.
+        Retorna a quantidade de linhas atualizadas.
+
+        É um UPDATE na tabela (Core): objetos dessas linhas já carregados na
+        sessão não são atualizados. Quem reler as linhas na mesma sessão deve
+        usar get_last_by_filters(refresh=True) ou db.expire_all() antes.
+        """
+        if not rows:
+            return 0
+
+        table = self.model.__table__
+        keys = ["id"] + [k for k in rows[0].keys() if k != "id"]
+
+        data = values(
+            *[column(k, table.c[k].type) for k in keys],
+            name="data"
+        ).data([tuple(row[k] for k in keys) for row in rows])
+
+        stmt = (
+            update(table)
+            .where(table.c.id == data.c.id)
+            .values({k: data.c[k] for k in keys if k != "id"})
+        )
+        result = await db.execute(stmt)
+
+        if commit:
+            await db.commit()
+        return result.rowcount
+
     async def update(
         self,
         db: AsyncSession,
         *,
         db_obj: ModelType,
-        obj_in: Union[UpdateSchemaType, Dict[str, Any]]
+        obj_in: Union[UpdateSchemaType, Dict[str, Any]],
+        commit: bool = True
     ) -> ModelType:
         update_data = obj_in if isinstance(
             obj_in, dict) else obj_in.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(db_obj, field, value)
+        if not commit:
+            await db.flush()
+            return db_obj
         await db.commit()
         await db.refresh(db_obj)
         return db_obj
@@ -508,11 +960,14 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
                 updated_objs.append(db_obj)
         return updated_objs
 
-    async def remove(self, db: AsyncSession, *, id: int) -> Optional[ModelType]:
+    async def remove(self, db: AsyncSession, *, id: int, commit: bool = True) -> Optional[ModelType]:
         stmt = select(self.model).where(self.model.id == id)
         result = await db.execute(stmt)
         obj = result.scalars().first()
         if obj:
             await db.delete(obj)
-            await db.commit()
+            if commit:
+                await db.commit()
+            else:
+                await db.flush()
         return obj
@@ -1,10 +1,29 @@
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from crud.baseAsync import CRUDBase
+from crud.reference_cache import reference_cache
 from models.client_model import Client
-from schemas.client_schema import ClientCreateSC, ClientUpdateSC
+from schemas.client_schema import ClientCreateSC, ClientUpdateSC, ClientInDBBaseSC
 
 
 class CRUDClient(CRUDBase[Client, ClientCreateSC, ClientUpdateSC]):
-    pass
+    def __init__(self, model):
+        super().__init__(model)
+        self.cache = reference_cache("client", ClientInDBBaseSC)
+
+    async def get_cached(self, db: AsyncSession, id: int) -> Optional[ClientInDBBaseSC]:
+        """Cliente por id, lido do cache de referência (snapshot, não é objeto ORM)."""
+        return await self.cache.get_or_load(
+            ("id", id), lambda: self.get(db=db, id=id, load="minimal"))
+
+    async def get_by_code_cached(self, db: AsyncSession, client_code: str) -> Optional[ClientInDBBaseSC]:
+        """Cliente por client_code, lido do cache de referência."""
+        return await self.cache.get_or_load(
+            ("client_code", client_code),
+            lambda: self.get_first_by_filter(
+                db=db, filterby="client_code", filter=client_code, load="minimal"))
 
 
 client_crud = CRUDClient(Client)
@@ -1,17 +1,35 @@
 from typing import Any, Dict, List, Optional
 from sqlalchemy import select, and_
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import raiseload, selectinload
 
 from crud.baseAsync import CRUDBase
 from models.item_model import Item
 from models.product_model import Product   # ajuste o caminho se necessário
 from models.location_model import Location  # ajuste o caminho se necessário
+from models.movement_model import Movement
 from schemas.item_schema import ItemCreate, ItemUpdate
 
 
 class CRUDItem(CRUDBase[Item, ItemCreate, ItemUpdate]):
-    pass
+    load_profiles = {
+        # colunas da listagem (ItemInDbListBase): produto, local e origem do último movimento de entrada
+        "listing": lambda: [
+            selectinload(Item.product),
+            selectinload(Item.location),
+            selectinload(Item.last_in_movement).options(
+                raiseload(Movement.item),
+                raiseload(Movement.from_location),
+                raiseload(Movement.to_location),
+            ),
+            raiseload("*"),
+        ],
+        # só o produto (ex.: montagem dos volumes da DCE)
+        "product": lambda: [
+            selectinload(Item.product),
+            raiseload("*"),
+        ],
+    }
 
 
 # instância exportada
@@ -1,11 +1,40 @@
+from typing import Any, Dict, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from crud.baseAsync import CRUDBase
+from crud.reference_cache import reference_cache
 from models.origin_model import OrderOrigin as Model
 from schemas.origin_schema import (OrderOriginCreate as SchemaCreate,
-                                   OrderOriginUpdate as SchemaUpdate)
+                                   OrderOriginUpdate as SchemaUpdate,
+                                   OrderOriginSnapshot)
 
 
 class CRUDItem(CRUDBase[Model, SchemaCreate, SchemaUpdate]):
-    pass
+    def __init__(self, model):
+        super().__init__(model)
+        self.cache = reference_cache("origin", OrderOriginSnapshot)
+
+    @staticmethod
+    def _hashable(value: Any) -> Any:
+        # listas (operador in) não servem como chave do cache
+        return tuple(value) if isinstance(value, (list, set)) else value
+
+    async def get_cached(self, db: AsyncSession, id: int) -> Optional[OrderOriginSnapshot]:
+        """Origem por id, lida do cache de referência (snapshot, não é objeto ORM)."""
+        return await self.cache.get_or_load(
+            ("id", id), lambda: self.get(db=db, id=id, load="minimal"))
+
+    async def get_last_by_filters_cached(
+        self, db: AsyncSession, *, filters: Dict[str, Dict[str, Any]]
+    ) -> Optional[OrderOriginSnapshot]:
+        """get_last_by_filters lido do cache de referência (chave: os próprios filtros)."""
+        key = ("filters",) + tuple(sorted(
+            (field, condition["operator"], self._hashable(condition.get("value")))
+            for field, condition in filters.items()
+        ))
+        return await self.cache.get_or_load(
+            key, lambda: self.get_last_by_filters(db=db, filters=filters, load="minimal"))
 
 
 origin = CRUDItem(Model)
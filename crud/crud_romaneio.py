@@ -1,10 +1,95 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload
+
+from core.config import settings
 from crud.baseAsync import CRUDBase
 from models.romaneio_model import Romaneio as Model
 from schemas.romaneio_schema import RomaneioCreate as SchemaCreate, RomaneioUpdate as SchemaUpdate
 
 
 class CRUDItem(CRUDBase[Model, SchemaCreate, SchemaUpdate]):
-    pass
+    load_profiles = {
+        # resposta do romaneio: local, origem e destino (sem o join do cliente)
+        "listing": lambda: [raiseload(Model.client)],
+    }
+
+    async def bump_version(self, db: AsyncSession, *, id: int, commit: bool = False) -> Optional[int]:
+        """
+        Incrementa a versão do romaneio e devolve o novo valor (UPDATE ... RETURNING).
+        Por padrão não faz commit: deve ir no mesmo commit da alteração dos itens.
+        O UPDATE trava a linha do romaneio até o fim da transação, serializando
+        as alterações concorrentes de itens do mesmo romaneio. Só vale para
+        romaneio ABERTO: devolve None se ele saiu de ABERTO depois da leitura
+        (ex.: finalização reservada), e o chamador não deve alterar os itens.
+        """
+        result = await db.execute(
+            update(self.model)
+            .where(self.model.id == id, self.model.status_rom == 'ABERTO')
+            .values(version=self.model.version + 1)
+            .returning(self.model.version)
+        )
+        version = result.scalar_one_or_none()
+        if commit:
+            await self._commit_with_retry(db)
+        return version
+
+    async def claim_for_finish(
+        self, db: AsyncSession, *, id: int, update_by: Optional[str] = None,
+        lease: Optional[float] = None
+    ) -> bool:
+        """
+        Reserva o romaneio para finalização (compare-and-set) num único UPDATE:
+        - ABERTO -> EM PROCESSAMENTO;
+        - ou reassume um romaneio EM PROCESSAMENTO cujo updated_at está parado há
+          mais de lease segundos (ROMANEIO_FINISH_CLAIM_TIMEOUT): finalização
+          interrompida (worker reiniciado/derrubado) sem devolver o romaneio.
+        Quem finaliza renova o updated_at a cada bloco (renew_finish_claim).
+        Retorna False se outro processo reservou/fechou o romaneio.
+        """
+        lease = settings.ROMANEIO_FINISH_CLAIM_TIMEOUT if lease is None else lease
+        now = datetime.now(timezone.utc)
+        result = await db.execute(
+            update(self.model)
+            .where(
+                self.model.id == id,
+                or_(
+                    self.model.status_rom == 'ABERTO',
+                    and_(self.model.status_rom == 'EM PROCESSAMENTO',
+                         self.model.updated_at < now - timedelta(seconds=lease))
+                )
+            )
+            .values(status_rom='EM PROCESSAMENTO', update_by=update_by, updated_at=now)
+            .returning(self.model.id)
+        )
+        claimed = result.scalar_one_or_none() is not None
+        await self._commit_with_retry(db)
+        return claimed
+
+    async def renew_finish_claim(self, db: AsyncSession, *, id: int, commit: bool = False) -> None:
+        """Renova a reserva da finalização (updated_at); vai no commit de cada bloco."""
+        await db.execute(
+            update(self.model)
+            .where(self.model.id == id, self.model.status_rom == 'EM PROCESSAMENTO')
+            .values(updated_at=datetime.now(timezone.utc))
+        )
+        if commit:
+            await self._commit_with_retry(db)
+
+    async def release_finish(self, db: AsyncSession, *, id: int) -> None:
+        """
+        Devolve para ABERTO um romaneio reservado que não foi fechado
+        (erro na finalização), permitindo reprocessar.
+        """
+        await db.execute(
+            update(self.model)
+            .where(self.model.id == id, self.model.status_rom == 'EM PROCESSAMENTO')
+            .values(status_rom='ABERTO')
+        )
+        await self._commit_with_retry(db)
 
 
 romaneio_crud = CRUDItem(Model)
@@ -1,10 +1,98 @@
+from sqlalchemy import Integer, String, cast, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from crud.baseAsync import CRUDBase
+from models.item_model import Item
 from models.romaneio_item_model import RomaneioItem as Model
 from schemas.romaneio_item_schema import RomaneioItemCreate as SchemaCreate, RomaneioItemUpdate as SchemaUpdate
 
 
 class CRUDItem(CRUDBase[Model, SchemaCreate, SchemaUpdate]):
-    pass
+
+    async def count_by_item_status(self, db: AsyncSession, *, romaneio_id: int, status: str) -> tuple[int, int]:
+        """
+        Total de itens do romaneio e quantos estão com o status informado,
+        numa única query (COUNT ... FILTER com join em logistic_stock_item).
+        """
+        result = await db.execute(
+            select(
+                func.count(self.model.id),
+                func.count(self.model.id).filter(Item.status == status)
+            )
+            .select_from(self.model)
+            .outerjoin(Item, Item.id == self.model.item_id)
+            .where(self.model.romaneio_id == romaneio_id)
+        )
+        total, with_status = result.one()
+        return total, with_status
+
+    async def next_kit_number(self, db: AsyncSession, *, romaneio_id: int, volume_number: str) -> int:
+        """
+        Próximo número de kit do volume (MAX + 1).
+        Só é seguro com o romaneio travado na transação (romaneio_crud.bump_version),
+        que serializa as inserções concorrentes no mesmo romaneio.
+        """
+        result = await db.execute(
+            select(func.coalesce(func.max(cast(self.model.kit_number, Integer)), 0) + 1)
+            .where(self.model.romaneio_id == romaneio_id)
+            .where(self.model.volume_number == volume_number)
+        )
+        return result.scalar_one()
+
+    async def renumber_kits(
+        self,
+        db: AsyncSession,
+        *,
+        romaneio_id: int,
+        volume_number: str | None = None,
+        commit: bool = True
+    ) -> int:
+        """
+        Renumera os kits de cada volume em sequência (1..n) com um único UPDATE
+        (row_number() por volume, na ordem atual dos kits). Só altera as linhas
+        cujo número mudou e devolve quantas foram alteradas.
+        """
+        filters = [self.model.romaneio_id == romaneio_id]
+        if volume_number is not None:
+            filters.append(self.model.volume_number == volume_number)
+
+        numbered = (
+            select(
+                self.model.id,
+                func.row_number().over(
+                    partition_by=self.model.volume_number,
+                    order_by=(cast(self.model.kit_number, Integer).nulls_last(),
+                              self.model.id)
+                ).label("new_kit_number")
+            )
+            .where(*filters)
+            .subquery()
+        )
+        new_kit_number = cast(numbered.c.new_kit_number, String)
+        result = await db.execute(
+            update(self.model)
+            .where(self.model.id == numbered.c.id)
+            .where(self.model.kit_number.is_distinct_from(new_kit_number))
+            .values(kit_number=new_kit_number)
+            .execution_options(synchronize_session="fetch")
+        )
+        if commit:
+            await self._commit_with_retry(db)
+        return result.rowcount
+
+    async def remove_and_renumber(self, db: AsyncSession, *, db_obj: Model, commit: bool = True) -> Model:
+        """Remove o item do romaneio e renumera os kits do volume dele na mesma transação."""
+        await db.delete(db_obj)
+        await db.flush()
+        await self.renumber_kits(
+            db=db,
+            romaneio_id=db_obj.romaneio_id,
+            volume_number=db_obj.volume_number,
+            commit=False
+        )
+        if commit:
+            await self._commit_with_retry(db)
+        return db_obj
 
 
 romaneio_crud_item = CRUDItem(Model)
@@ -0,0 +1,65 @@
+from typing import Dict, Tuple
+
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from crud.baseAsync import CRUDBase
+from models.stock_summary_model import StockPositionSummary as Model
+from schemas.stock_summary_schema import StockSummaryCreate as SchemaCreate, StockSummaryUpdate as SchemaUpdate
+
+# (location_id, stock_type, product_id, ztipo, status)
+SummaryKey = Tuple[int, str, int, str, str]
+
+
+class CRUDStockSummary(CRUDBase[Model, SchemaCreate, SchemaUpdate]):
+
+    async def apply_deltas(
+        self,
+        db: AsyncSession,
+        *,
+        deltas: Dict[SummaryKey, int],
+        commit: bool = True
+    ) -> None:
+        """
+        Soma os deltas de quantidade nas chaves da posição de estoque com um
+        único INSERT ... ON CONFLICT DO UPDATE (chaves novas entram com o delta).
+        """
+        rows = [
+            {
+                "location_id": location_id,
+                "stock_type": stock_type,
+                "product_id": product_id,
+                "ztipo": ztipo,
+                "status": status,
+                "qty": qty,
+            }
+            for (location_id, stock_type, product_id, ztipo, status), qty in deltas.items()
+            if qty
+        ]
+        if not rows:
+            return
+
+        table = self.model.__table__
+        stmt = pg_insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_stock_position_summary_key",
+            set_={
+                "qty": table.c.qty + stmt.excluded.qty,
+                "updated_at": func.now(),
+            }
+        )
+        await db.execute(stmt)
+        if commit:
+            await self._commit_with_retry(db)
+
+    async def remove_empty(self, db: AsyncSession, *, commit: bool = True) -> int:
+        """Remove as chaves que ficaram com quantidade zero."""
+        result = await db.execute(
+            delete(self.model).where(self.model.qty == 0))
+        if commit:
+            await self._commit_with_retry(db)
+        return result.rowcount
+
+
+stock_summary_crud = CRUDStockSummary(Model)
@@ -0,0 +1,69 @@
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Type
+
+from cachetools import TTLCache
+from pydantic import BaseModel
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ReferenceDataCache:
+    """
+    Cache em memória (TTL) das leituras de tabelas de referência: clientes
+    e origens, que mudam raramente e são consultados a cada movimento.
+
+    Guarda um snapshot no schema informado (e não o objeto ORM), então o valor
+    pode ser usado em qualquer sessão. Só os atributos do schema ficam
+    disponíveis; relacionamentos não. Ausências (None) não são guardadas.
+    Os endpoints de escrita chamam invalidate() para a mudança valer na hora.
+    Em mais de um processo (workers), a invalidação é local e os demais
+    enxergam a mudança quando o TTL expira.
+    """
+
+    def __init__(self, name: str, schema: Type[BaseModel], maxsize: int, ttl: float) -> None:
+        self.name = name
+        self.schema = schema
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl, timer=time.monotonic)
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Optional[BaseModel]:
+        value = self._cache.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        obj = await loader()
+        if obj is None:
+            return None
+        value = self.schema.model_validate(obj, from_attributes=True)
+        self._cache[key] = value
+        return value
+
+    def invalidate(self) -> None:
+        # as chaves misturam id e filtros, então qualquer escrita limpa a tabela inteira
+        self._cache.clear()
+        logger.info(f"Cache de referência '{self.name}' invalidado")
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "maxsize": self._cache.maxsize,
+            "ttl": self._cache.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def reference_cache(name: str, schema: Type[BaseModel]) -> ReferenceDataCache:
+    return ReferenceDataCache(
+        name=name,
+        schema=schema,
+        maxsize=settings.REFERENCE_CACHE_MAXSIZE,
+        ttl=settings.REFERENCE_CACHE_TTL
+    )
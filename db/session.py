@@ -1,7 +1,8 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
 from core.config import settings
+from core.logging_config import sql_query_count
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 
 
@@ -14,6 +15,15 @@ engine_psql = create_async_engine(
 
 # SQLAlchemyInstrumentor().instrument(engine=engine_psql)
 
+
+@event.listens_for(engine_psql.sync_engine, "before_cursor_execute")
+def _count_sql_queries(conn, cursor, statement, parameters, context, executemany):
+    # quantidade de comandos SQL por requisição (logada pelo RequestLoggingMiddleware)
+    queries = sql_query_count.get()
+    if queries is not None:
+        queries[0] += 1
+
+
 # Criando a fábrica de sessões assíncronas
 SessionLocal_psql = sessionmaker(
     bind=engine_psql,
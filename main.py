@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 import logging
@@ -8,6 +9,15 @@ from fastapi.openapi.docs import get_swagger_ui_html, get_redoc_html
 from fastapi.openapi.utils import get_openapi
 from core.logging_config import setup_logging
 from core.logging_config import RequestLoggingMiddleware
+from core.request import http_client_manager
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # cliente HTTP compartilhado (pool/keep-alive) vive junto com a aplicação
+    await http_client_manager.start()
+    yield
+    await http_client_manager.stop()
 
 
 def api_factory():
@@ -18,7 +28,8 @@ def api_factory():
                   contact={
                       "name": "Igor Rocha",
                       "email": "igor.rocha@c-trends.com.br",
-                  }
+                  },
+                  lifespan=lifespan
                   )
     app.add_middleware(RequestLoggingMiddleware)
     setup_logging()
@@ -6,5 +6,6 @@ from .origin_model import OrderOrigin
 from .romaneio_model import Romaneio
 from .romaneio_item_model import RomaneioItem
 from .client_model import Client
-from .item_provisional_serial_model import ProvisionalSerialItem
+from .item_provisional_serial_model import ProvisionalSerialItem, ProvisionalSerialCounter
 from .errors_model import StockErrors
+from .stock_summary_model import StockPositionSummary
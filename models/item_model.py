@@ -54,4 +54,6 @@ class Item(Base):
                 "(extra_info -> 'consulta_sincrona' ->> 'ZTIPO') IS NOT NULL"
             ),
         ),
+        # Chave da paginação por cursor (keyset) da listagem de items
+        Index("ix_item_created_at_id", "created_at", "id"),
     )
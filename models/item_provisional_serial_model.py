@@ -1,6 +1,6 @@
 import enum
 from sqlalchemy import (
-    Column, Integer, String, DateTime, ForeignKey, JSON, Enum, UniqueConstraint, func, event, text
+    Column, Date, Integer, String, DateTime, ForeignKey, JSON, Enum, UniqueConstraint, func, event, text
 )
 from sqlalchemy.orm import relationship
 from db.base_class import Base
@@ -37,24 +37,34 @@ class ProvisionalSerialItem(Base):
     )
 
 
+class ProvisionalSerialCounter(Base):
+    """Último número de serial provisório gerado em cada dia (ILG-DDMMYY-NNNN)."""
+    __tablename__ = "logistic_stock_provisional_serial_counter"
+    day = Column(Date, primary_key=True)
+    last_value = Column(Integer, nullable=False, default=0)
+
+
 @event.listens_for(ProvisionalSerialItem, "before_insert")
 def generate_romaneio_number(mapper, connection, target):
-    # Conta quantos registros já existem HOJE
+    # Data atual
+    now = datetime.now()
+
+    # Reserva o próximo número do dia de forma atômica: o UPSERT trava a linha
+    # do dia até o commit, então inserts concorrentes nunca pegam o mesmo número
+    # e um rollback devolve o número (sequência sem buracos)
     result = connection.execute(
         text(
             f"""
-            SELECT COUNT(*) 
-            FROM {ProvisionalSerialItem.__tablename__}
-            WHERE created_at::date = CURRENT_DATE
+            INSERT INTO {ProvisionalSerialCounter.__tablename__} AS c (day, last_value)
+            VALUES (:day, 1)
+            ON CONFLICT (day) DO UPDATE SET last_value = c.last_value + 1
+            RETURNING c.last_value
             """
-        )
+        ),
+        {"day": now.date()}
     )
+    next_sequence = result.scalar()
 
-    daily_count = result.scalar() or 0
-    next_sequence = daily_count + 1
-
-    # Data atual
-    now = datetime.now()
     year = str(now.year)[-2:]
     month = str(now.month).zfill(2)
     day = str(now.day).zfill(2)
@@ -1,7 +1,7 @@
 from datetime import datetime, timezone
 import enum
 from sqlalchemy import (
-    Column, Integer, String, DateTime, ForeignKey, JSON, Enum, UniqueConstraint, func
+    Column, Integer, String, DateTime, ForeignKey, JSON, Enum, UniqueConstraint, Index, func
 )
 from sqlalchemy.orm import relationship
 from db.base_class import Base
@@ -31,3 +31,9 @@ class RomaneioItem(Base):
 
     item = relationship("Item", foreign_keys=[item_id], lazy="selectin")
     romaneio = relationship("Romaneio", lazy="selectin")
+
+    __table_args__ = (
+        # numeração dos kits e consultas por volume
+        Index("ix_reverse_item_romaneio_volume",
+              "romaneio_id", "volume_number"),
+    )
@@ -22,6 +22,8 @@ class Romaneio(Base):
     destination_id = Column(Integer, ForeignKey(
         "logistica_groupaditionalinformation.id"), nullable=True,)
     status_rom = Column(String, nullable=False, default="ABERTO", index=True)
+    # incrementado a cada item inserido/removido (sincronização incremental dos clientes)
+    version = Column(Integer, nullable=False, default=0, server_default='0')
 
     created_at = Column(
         DateTime(timezone=True),
@@ -70,10 +72,16 @@ def generate_romaneio_number(mapper, connection, target):
     if not target.client_id:
         raise ValueError("client_id deve ser definido antes de salvar.")
 
-    result = connection.execute(
-        text(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {Romaneio.__tablename__}")
-    )
-    next_id = result.scalar()
+    # Reserva o id na própria sequence da PK: nextval é atômico e O(1), então
+    # criações concorrentes nunca geram o mesmo número. O número continua
+    # carregando o id real (consulta_romaneio/update_rom_by_movement dependem disso)
+    if target.id is None:
+        result = connection.execute(
+            text(
+                f"SELECT nextval(pg_get_serial_sequence('{Romaneio.__tablename__}', 'id'))")
+        )
+        target.id = result.scalar()
+    next_id = target.id
 
     if target.client_id == 1:
         target.romaneio_number = f"AR{target.client_id}05{str(next_id).zfill(10)}"
@@ -0,0 +1,45 @@
+from datetime import datetime, timezone
+from sqlalchemy import (
+    Column, Integer, String, DateTime, ForeignKey, UniqueConstraint, func
+)
+from sqlalchemy.orm import relationship
+from db.base_class import Base
+
+
+class StockPositionSummary(Base):
+    """
+    Posição de estoque consolidada: quantidade de items por
+    (location, stock_type, produto, ZTIPO, status).
+
+    Mantida de forma incremental pelas movimentações (services/stock_summary.py)
+    e usada pelos endpoints de resumo no lugar de contar logistic_stock_item.
+    stock_type e ztipo usam '' quando não há valor (para entrarem na chave única).
+    """
+    __tablename__ = "logistic_stock_position_summary"
+
+    id = Column(Integer, primary_key=True)
+    location_id = Column(Integer, ForeignKey(
+        "logistica_groupaditionalinformation.id"), nullable=False, index=True)
+    stock_type = Column(String(50), nullable=False, server_default='')
+    product_id = Column(Integer, ForeignKey(
+        "logistic_stock_product.id"), nullable=False, index=True)
+    ztipo = Column(String, nullable=False, server_default='')
+    status = Column(String, nullable=False, index=True)
+    qty = Column(Integer, nullable=False, server_default='0')
+    updated_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False
+    )
+
+    location = relationship("Location")
+    product = relationship("Product")
+
+    __table_args__ = (
+        UniqueConstraint(
+            "location_id", "stock_type", "product_id", "ztipo", "status",
+            name="uq_stock_position_summary_key"
+        ),
+    )
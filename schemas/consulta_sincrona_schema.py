@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, Field
 
 
 class ResponseConsultaSincSC(BaseModel):
@@ -28,3 +29,23 @@ class ResponseConsultaSincSC(BaseModel):
     class Config:
         from_attributes = True
         populate_by_name = True
+
+
+class ConsultaSincronaBulkResult(BaseModel):
+    serial: str
+    ok: bool
+    data: Optional[ResponseConsultaSincSC] = None
+    error: Optional[str] = None
+
+
+class DeliveryValidationPayload(BaseModel):
+    serials: List[str] = Field(..., min_length=1, max_length=1000)
+    location_id: Optional[int] = None
+    bypass_cache: bool = False
+
+
+class DeliveryValidationResult(BaseModel):
+    serial: str
+    valid: bool
+    error: Optional[str] = None
+    sap: Optional[ResponseConsultaSincSC] = None
@@ -42,6 +42,19 @@ class OrderOriginInDbBase(OrderOriginBase):
                     description="ID interno da origem no banco de dados", example=1)
 
 
+class OrderOriginSnapshot(BaseModel):
+    """
+    Snapshot da origem guardado no cache de referência. Segue a nulidade das
+    colunas do model (client_id é nullable), diferente do schema de entrada.
+    """
+    id: int
+    origin_name: str
+    project_name: Optional[str] = None
+    client_id: Optional[int] = None
+    stock_type: Optional[str] = None
+    model_config = {"from_attributes": True}
+
+
 class OrderOrigin(OrderOriginInDbBase):
     """Schema retornado pela API ao consultar uma origem"""
     pass
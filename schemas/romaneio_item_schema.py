@@ -1,7 +1,7 @@
 import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 from zoneinfo import ZoneInfo
-from pydantic import BaseModel, field_serializer
+from pydantic import BaseModel, Field, field_serializer
 from schemas.product_schema import ProductInDbBase
 
 
@@ -39,6 +39,19 @@ class RomaneioItemResponse(BaseModel):
     destination_id: Optional[int] = None
     destination: Optional[str] = None
     volums: List[RomaneioItemVolum]
+    version: Optional[int] = None
+    incremental: bool = False
+
+
+class RomaneioItemDeltaResponse(BaseModel):
+    """Resposta incremental: só o volume afetado e a nova versão do romaneio."""
+    romaneio: str
+    status: str
+    version: int
+    incremental: bool = True
+    action: Literal['added', 'removed', 'unchanged']
+    volum: RomaneioItemVolum
+    kit: Optional[RomaneioItemKit] = None
 
 
 class RomaneioItemPayload(BaseModel):
@@ -50,6 +63,26 @@ class RomaneioItemPayload(BaseModel):
     create_by: str
 
 
+class RomaneioItemBulkPayload(BaseModel):
+    serials: List[str] = Field(..., min_length=1, max_length=1000)
+    volume_number: str
+    client: str
+    location_id: int
+    create_by: str
+
+
+class RomaneioItemBulkResult(BaseModel):
+    serial: str
+    accepted: bool
+    kit_number: Optional[str] = None
+    detail: Optional[str] = None
+
+
+class RomaneioItemBulkResponse(BaseModel):
+    results: List[RomaneioItemBulkResult]
+    romaneio: RomaneioItemResponse
+
+
 class RomaneioItemBase(BaseModel):
     romaneio_id: Optional[int] = None
     item_id: Optional[int] = None
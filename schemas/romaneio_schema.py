@@ -1,5 +1,5 @@
 import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from zoneinfo import ZoneInfo
 from pydantic import BaseModel, field_serializer, Field
 from schemas.location_schema import LocationBasic
@@ -61,6 +61,7 @@ class RomaneioInDbBase(RomaneioBase):
     location_id: int
     origin_id: Optional[int] = None
     destination_id: Optional[int] = None
+    version: int = 0
 
     @field_serializer("created_at", "updated_at", when_used="always")
     def serialize_dt(self, dt: datetime.datetime | None):
@@ -94,8 +95,25 @@ class RomaneioFinisheData(BaseModel):
 class RomaneioFineshedResponse(BaseModel):
     romaneio_number: str
     status_rom: str
-    finished_at: datetime.datetime
+    finished_at: Optional[datetime.datetime] = None
     description: Optional[str] = None
+    job_id: Optional[str] = None
+
+
+class RomaneioFinishJobStatus(BaseModel):
+    job_id: str
+    romaneio_number: str
+    status: str = Field(
+        ...,
+        description="PENDENTE, EM PROCESSAMENTO, CONCLUIDO, CONCLUIDO COM ERROS ou ERRO",
+        example="EM PROCESSAMENTO"
+    )
+    total: int = 0
+    processed: int = 0
+    failed: int = 0
+    errors: List[Dict[str, Any]] = []
+    created_at: datetime.datetime
+    finished_at: Optional[datetime.datetime] = None
 
 
 class RomaneioListBase(BaseModel):
@@ -0,0 +1,17 @@
+from typing import List, Optional
+from pydantic import BaseModel
+
+
+class StockImportReject(BaseModel):
+    line: int
+    serial: Optional[str] = None
+    reason: str
+
+
+class StockImportResult(BaseModel):
+    total: int
+    imported: int
+    rejected: int
+    # limitado a STOCK_IMPORT_MAX_REJECTS (rejected traz o total)
+    rejects: List[StockImportReject]
+    dry_run: bool = False
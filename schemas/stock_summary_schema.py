@@ -0,0 +1,35 @@
+from typing import List, Optional
+from pydantic import BaseModel
+
+
+class StockSummaryBase(BaseModel):
+    location_id: int
+    stock_type: str = ''
+    product_id: int
+    ztipo: str = ''
+    status: str
+    qty: int = 0
+
+
+class StockSummaryCreate(StockSummaryBase):
+    pass
+
+
+class StockSummaryUpdate(BaseModel):
+    qty: int
+
+
+class StockSummaryDrift(BaseModel):
+    location_id: int
+    stock_type: Optional[str] = None
+    product_id: int
+    ztipo: Optional[str] = None
+    status: str
+    expected: int
+    actual: int
+
+
+class StockSummaryReconcileResult(BaseModel):
+    groups: int
+    drift: List[StockSummaryDrift]
+    fixed: bool
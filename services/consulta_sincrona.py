@@ -1,27 +1,115 @@
+import asyncio
+import copy
+import logging
+import time
+from typing import Any, Dict, Iterable, Optional
 
-
+import httpx
+from cachetools import TLRUCache
 from fastapi import HTTPException, status
+from core.config import settings
 from core.request import RequestClient
-from schemas.consulta_sincrona_schema import ResponseConsultaSincSC
+from schemas.consulta_sincrona_schema import ConsultaSincronaBulkResult, ResponseConsultaSincSC
+
+logger = logging.getLogger(__name__)
+
+
+class ConsultaSincronaCache:
+    """
+    Cache LRU limitado dos retornos da consulta síncrona, por serial.
+
+    O TTL de cada entrada depende do retorno: respostas sem sucesso (TYPE != 'S')
+    expiram em SAP_SYNC_CACHE_ERROR_TTL e as demais usam o TTL do status do
+    equipamento (SAP_SYNC_CACHE_TTL_BY_STATUS[STTXT]) ou SAP_SYNC_CACHE_TTL.
+    Falhas de comunicação não são guardadas.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self._cache = TLRUCache(maxsize=maxsize, ttu=self._ttu, timer=time.monotonic)
+        self.hits = 0
+        self.misses = 0
+        self.bypass = 0
+
+    @staticmethod
+    def _ttu(key: str, value: Dict[str, Any], now: float) -> float:
+        if value.get('TYPE') != 'S':
+            return now + settings.SAP_SYNC_CACHE_ERROR_TTL
+        ttl = settings.SAP_SYNC_CACHE_TTL_BY_STATUS.get(
+            value.get('STTXT'), settings.SAP_SYNC_CACHE_TTL)
+        return now + ttl
+
+    def get(self, serial: str) -> Optional[Dict[str, Any]]:
+        value = self._cache.get(serial)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return copy.deepcopy(value)
+
+    def set(self, serial: str, value: Dict[str, Any]) -> None:
+        if isinstance(value, dict):
+            self._cache[serial] = copy.deepcopy(value)
+
+    def invalidate(self, serial: Optional[str] = None) -> None:
+        if serial is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(serial, None)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "maxsize": self._cache.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypass": self.bypass,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+consulta_sincrona_cache = ConsultaSincronaCache(
+    maxsize=settings.SAP_SYNC_CACHE_MAXSIZE)
 
 
 class ConsultaSincrona:
-    def __init__(self):
-        self.url = 'http://192.168.0.214/IntegrationXmlAPI/api/v1/clo/sincrona/'
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
+        self.url = settings.SAP_SYNC_URL
         self.headers = {
             "Content-Type": 'application/json'}
+        # cliente compartilhado da aplicação quando não informado
+        self.client = client
+
+    async def consultar(self, serial: str, bypass_cache: bool = False) -> Dict[str, Any]:
+        """
+        Consulta o serial no SAP e devolve o JSON bruto (erros são propagados).
+        bypass_cache=True ignora o cache na leitura, mas atualiza com o novo retorno.
+        """
+        if bypass_cache:
+            consulta_sincrona_cache.bypass += 1
+        else:
+            cached = consulta_sincrona_cache.get(serial)
+            if cached is not None:
+                logger.info(f"Consulta síncrona do serial {serial} atendida pelo cache")
+                return cached
 
-    async def executar_by_serial(self, serial: str) -> ResponseConsultaSincSC:
         request_data = {'SERGE': serial}
 
         request = RequestClient(
             method='POST',
-            headers=self.headers,
+            headers=dict(self.headers),
             request_data=request_data,
-            url=self.url
+            url=self.url,
+            client=self.client,
+            breaker='sap_sync'
         )
+        response = await request.send_api_request()
+        consulta_sincrona_cache.set(serial, response)
+        return response
+
+    async def executar_by_serial(self, serial: str, bypass_cache: bool = False) -> ResponseConsultaSincSC:
         try:
-            response = await request.send_api_request()
+            response = await self.consultar(serial, bypass_cache=bypass_cache)
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_424_FAILED_DEPENDENCY,
@@ -33,3 +121,32 @@ class ConsultaSincrona:
         result = ResponseConsultaSincSC(**response)
 
         return result
+
+    async def executar_many(
+        self,
+        serials: Iterable[str],
+        bypass_cache: bool = False,
+        max_concurrency: Optional[int] = None
+    ) -> Dict[str, ConsultaSincronaBulkResult]:
+        """
+        Consulta vários seriais em paralelo (no máximo max_concurrency ao mesmo tempo).
+        Seriais repetidos são consultados uma vez só. Nunca levanta exceção:
+        cada serial volta com o retorno do SAP ou com o erro.
+        """
+        unique_serials = list(dict.fromkeys(serials))
+        semaphore = asyncio.Semaphore(
+            max_concurrency or settings.SAP_SYNC_MAX_CONCURRENCY)
+
+        async def _consulta(serial: str) -> ConsultaSincronaBulkResult:
+            async with semaphore:
+                try:
+                    response = await self.consultar(serial, bypass_cache=bypass_cache)
+                    return ConsultaSincronaBulkResult(
+                        serial=serial, ok=True, data=ResponseConsultaSincSC(**response))
+                except Exception as e:
+                    logger.error(f"Erro na consulta síncrona do serial {serial}: {e}")
+                    return ConsultaSincronaBulkResult(
+                        serial=serial, ok=False, error=f"Erro na consulta síncrona: {e}")
+
+        results = await asyncio.gather(*[_consulta(serial) for serial in unique_serials])
+        return {result.serial: result for result in results}
@@ -0,0 +1,143 @@
+import csv
+import io
+import json
+import logging
+import tempfile
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from openpyxl import Workbook
+from starlette.concurrency import run_in_threadpool
+
+from crud.crud_item import item
+from db.session import SessionLocal_psql
+from utils import flatten_dict
+
+logger = logging.getLogger(__name__)
+
+
+class ItemExportService:
+    """
+    Export de items em streaming (CSV ou XLSX).
+
+    As linhas vêm do banco por cursor no servidor (CRUDBase.stream_columns),
+    já projetadas nas colunas do export, e são escritas uma a uma. Nenhum
+    objeto ORM é montado e o resultado nunca fica inteiro em memória.
+    """
+
+    # colunas buscadas no banco (caminhos no formato dos filtros do CRUDBase)
+    COLUMNS = [
+        "id",
+        "serial",
+        "status",
+        "created_at",
+        "extra_info",
+        "location.cod_iata",
+        "location.nome",
+        "location.deposito",
+        "product.sku",
+        "product.description",
+        "product.category",
+        "last_in_movement.created_at",
+        "last_in_movement.origin.stock_type",
+    ]
+    CSV_FLUSH_ROWS = 500
+    FILE_CHUNK_SIZE = 64 * 1024
+    # teto do xlsx quando o limit não é informado (o csv sem limit exporta tudo)
+    XLSX_DEFAULT_LIMIT = 5000
+
+    def __init__(self, filters: List[Dict[str, Any]], ordered_columns: List[str], limit: Optional[int] = None):
+        self.filters = filters
+        self.ordered_columns = ordered_columns
+        self.limit = limit
+
+    async def _rows(self) -> AsyncIterator[List[Any]]:
+        # A sessão da dependency já foi fechada quando o corpo do
+        # StreamingResponse é enviado, então o generator abre a sua
+        async with SessionLocal_psql() as db:
+            async for row in item.stream_columns(
+                db=db,
+                filters=self.filters,
+                columns=self.COLUMNS,
+                order_by="created_at",
+                order_desc=True,
+                limit=self.limit,
+            ):
+                yield self._build_row(row)
+
+    def _build_row(self, row: Dict[str, Any]) -> List[Any]:
+        """Monta a linha do export com as mesmas colunas do ItemInDbListBase(Cielo)."""
+        cod_iata = row["location_cod_iata"]
+        nome = row["location_nome"]
+        data = {
+            "id": row["id"],
+            "serial": row["serial"],
+            "status": row["status"],
+            "location_name": F'{cod_iata}-{nome}' if cod_iata else nome,
+            "location_deps": row["location_deposito"] or None,
+            "product_sku": row["product_sku"],
+            "product_description": row["product_description"],
+            "produtct_category": row["product_category"],
+            "last_movement_in_date": row["last_in_movement_created_at"],
+            "stock_type": row["last_in_movement_origin_stock_type"],
+            "extra_info": row["extra_info"],
+        }
+
+        # itero todos os objetos dentro de extra_info e crio eles e seus valores como colunas
+        extra_info = row["extra_info"] or {}
+        if isinstance(extra_info, dict) and extra_info:
+            for key, value in flatten_dict(extra_info).items():
+                data[f"extra_{key}".lower()] = value
+
+        return [self._cell(data.get(col)) for col in self.ordered_columns]
+
+    @staticmethod
+    def _cell(value: Any) -> Any:
+        if isinstance(value, datetime):
+            # planilha não aceita timezone; mantém o horário como veio do banco
+            return value.replace(tzinfo=None)
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, ensure_ascii=False, default=str)
+        return value
+
+    async def iter_csv(self) -> AsyncIterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        # BOM para o Excel reconhecer o UTF-8
+        buffer.write("\ufeff")
+        writer.writerow(self.ordered_columns)
+
+        pending = 0
+        async for row in self._rows():
+            writer.writerow(row)
+            pending += 1
+            if pending >= self.CSV_FLUSH_ROWS:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate(0)
+                pending = 0
+
+        yield buffer.getvalue().encode("utf-8")
+
+    async def iter_xlsx(self, sheet_name: str = "IN_DEPOT_ITEMS") -> AsyncIterator[bytes]:
+        # write_only grava as linhas em arquivo temporário conforme chegam,
+        # com memória constante; o zip final vai para disco e é enviado em blocos.
+        # Não é incremental: nada é enviado antes do wb.save (só o CSV faz streaming)
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(title=sheet_name)
+        ws.append(self.ordered_columns)
+
+        total = 0
+        async for row in self._rows():
+            ws.append(row)
+            total += 1
+
+        with tempfile.TemporaryFile() as tmp:
+            await run_in_threadpool(wb.save, tmp)
+            tmp.seek(0)
+            logger.info(f"Export XLSX gerado com {total} linhas")
+            while True:
+                chunk = await run_in_threadpool(tmp.read, self.FILE_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
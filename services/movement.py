@@ -1,9 +1,10 @@
-from typing import Any, List
+from typing import Any, Callable, Dict, List, Tuple
 import logging
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from core.request import RequestClient
+import httpx
 
 from crud.crud_product import product
 from crud.crud_movement import movement
@@ -16,14 +17,21 @@ from crud.crud_origin import origin as crud_origin
 from schemas.product_schema import ProductCreate, ProductUpdate, ProductInDbBase
 from schemas.item_schema import ItemCreate, ItemProductUpdate, ItemStatus, ItemUpdate, ItemInDbBase
 from schemas.movement_schema import MovementCreate, MovementPayload, MovementInDbBase, MovementType
-from schemas.romaneio_schema import RomaneioUpdate
+from schemas.romaneio_schema import RomaneioFinisheData, RomaneioUpdate
 from schemas.item_provisional_serial_schema import ProvisionalSerialCreate, ProvisionalSerialUpdate, ProvisionalSerialInDbBase
 from schemas.origin_schema import OrderOriginBase
+from db.session import SessionLocal_psql
+from services.consulta_sincrona import ConsultaSincrona
+from services.stock_summary import stock_summary_service
 
 logger = logging.getLogger(__name__)
 
 
 class MovementService:
+    def __init__(self, http_client: httpx.AsyncClient | None = None):
+        # cliente HTTP usado na consulta síncrona (compartilhado da aplicação se None)
+        self.http_client = http_client
+
     def _get_status(self, movement_type: MovementType) -> str:
         """Retorna o novo status de um Item baseado no tipo de movimentação."""
 
@@ -50,28 +58,23 @@ class MovementService:
         else:
             romaneio_id = int(romaneio_in[3:].lstrip('0'))
 
-        _romaneio = await romaneio_crud.get(db=db, id=romaneio_id)
+        _romaneio = await romaneio_crud.get(db=db, id=romaneio_id, load="minimal")
         if not _romaneio:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail='Romaneio não encontrado.'
             )
-        _items = await romaneio_crud_item.get_multi_filter(
+        total, with_status = await romaneio_crud_item.count_by_item_status(
             db=db,
-            filterby='romaneio_id',
-            filter=romaneio_id
+            romaneio_id=romaneio_id,
+            status=item_status_required
         )
-        if not _items:
+        if not total:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail='Nenhum item encontrado para esse romaneio.'
             )
-        all_with_customer = True
-        for rom_item in _items:
-            _item = await item.get(db=db, id=rom_item.item_id)
-            if _item.status != item_status_required:
-                all_with_customer = False
-                break
+        all_with_customer = with_status == total
         if all_with_customer and _romaneio.status_rom != 'FECHADO':
             rom_update = RomaneioUpdate(
                 status_rom='FECHADO'
@@ -91,12 +94,16 @@ class MovementService:
             created_by=payload.created_by,
             reason='Serial não encontrado na Consulta Sincrona.'
         )
-        _provisional_serial = await item_provisional_serial_crud.create(db=db, obj_in=provisional_serial_in)
+        # sessão própria: o commit do serial provisório não pode levar junto as
+        # escritas pendentes da transação da movimentação (que será desfeita)
+        async with SessionLocal_psql() as provisional_db:
+            _provisional_serial = await item_provisional_serial_crud.create(
+                db=provisional_db, obj_in=provisional_serial_in)
         logger.info(
             f"Serial provisória criada com ID: {_provisional_serial.id}")
         return _provisional_serial
 
-    async def create_movement(self, db: Session, payload: MovementPayload) -> ItemInDbBase:
+    async def create_movement(self, db: Session, payload: MovementPayload, commit: bool = True) -> ItemInDbBase:
         """
         0. Se o product_id do item estiver como zero e o cliente for Cielo. Tento localizar o produto, se não conseguir, retorno um erro.
         1. Verifica se o item já existe, se não existir, cria o item
@@ -104,14 +111,29 @@ class MovementService:
         3. Atualiza o location e o status do item de acordo com o movimento
         4. Retorna o Item para que seja visualizada a sua posição final
 
+        Tudo numa única transação (as escritas só fazem flush) com um commit no fim.
+        A exceção é o serial provisório, gravado numa sessão própria (commit separado) antes do erro 424.
+        Com commit=False o chamador controla a transação.
         """
+        try:
+            _item = await self._create_movement(db=db, payload=payload)
+            if commit:
+                await db.commit()
+        except Exception:
+            if commit:
+                await db.rollback()
+            raise
+        return _item
+
+    async def _create_movement(self, db: Session, payload: MovementPayload) -> ItemInDbBase:
 
         logger.info("Consultando item...")
         _item = await item.get_last_by_filters(
             db=db,
             filters={
                 'serial': {'operator': '==', 'value': payload.item.serial}
-            })
+            },
+            load="minimal")
 
         if not _item and payload.movement_type.value not in ['IN', 'COLLECTED']:
             raise HTTPException(
@@ -119,6 +141,10 @@ class MovementService:
                 detail=f'Item {payload.item.serial} não encontrado. Para movimentações diferentes de IN, o item deve existir.'
             )
 
+        # posição do item no resumo de estoque antes da movimentação
+        summary_before = await stock_summary_service.snapshot(
+            db=db, item_ids=[_item.id] if _item else [], lock=True)
+
         if payload.movement_type.value not in ['IN', 'COLLECTED', 'DELIVERY'] and _item.status != 'IN_DEPOT':
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -128,18 +154,11 @@ class MovementService:
         if not _item:
             if payload.client_name == 'cielo' and not payload.item.serial.startswith('ILG'):
                 # Vou tentar localizar o serial na consulta síncrona da Cielo e pegar as informações do produto
-                request_data = {"SERGE": payload.item.serial}
-
-                request = RequestClient(
-                    method='POST',
-                    headers={
-                        "Content-Type": 'application/json'},
-                    request_data=request_data,
-                    url='http://192.168.0.214/IntegrationXmlAPI/api/v1/clo/sincrona/'
-                )
                 try:
-                    result = await request.send_api_request()
+                    result = await ConsultaSincrona(client=self.http_client).consultar(payload.item.serial)
                 except Exception as e:
+                    # inclui CircuitOpenError: com o circuito do SAP aberto a falha é imediata
+                    # e o item segue direto para o serial provisório
                     result = False
                     product_item = await product.get(
                         db=db,
@@ -163,33 +182,31 @@ class MovementService:
 
                     payload.item.extra_info['consulta_sincrona'] = result
 
-                # Se achar, consulto o produto pelo sku pra ver se tem cadastro, se não tiver, crio
+                # Se achar, crio o produto pelo sku caso ainda não tenha cadastro
                 if result:
-                    _product = await product.get_last_by_filters(
-                        db=db,
-                        filters={
-                            'sku': {'operator': '==', 'value': result['MATNR']}
-                        })
-                    if not _product:
-                        product_in = ProductCreate(
-                            category=result['ZTIPO'],
-                            client_id=1,
-                            description=result['SHTXT'],
-                            sku=result['MATNR'],
-                            created_by='SAP',
-                            extra_info={
-                                "measures": {
-                                    "width": 22.4,
-                                    "weight": 0.737,
-                                    "length": 18.3,
-                                    "height": 6.7,
-                                    "quantity": 1,
-                                    "price": 150.55
-                                },
-                                "alert": "Produto criado automaticamente via integração com o SAP."
-                            }
-                        )
-                        _product = await product.create(db=db, obj_in=product_in)
+                    product_in = ProductCreate(
+                        category=result['ZTIPO'],
+                        client_id=1,
+                        description=result['SHTXT'],
+                        sku=result['MATNR'],
+                        created_by='SAP',
+                        extra_info={
+                            "measures": {
+                                "width": 22.4,
+                                "weight": 0.737,
+                                "length": 18.3,
+                                "height": 6.7,
+                                "quantity": 1,
+                                "price": 150.55
+                            },
+                            "alert": "Produto criado automaticamente via integração com o SAP."
+                        }
+                    )
+                    # um único INSERT ... ON CONFLICT (sku): se o produto já existe, é reaproveitado
+                    _product, product_created = await product.upsert(
+                        db=db, obj_in=product_in, conflict=['sku'], commit=False)
+                    if product_created:
+                        logger.info(f"Produto {_product.sku} criado via SAP")
 
                     payload.item.product_id = _product.id
 
@@ -208,8 +225,16 @@ class MovementService:
                 location_id=payload.to_location_id if payload.to_location_id else payload.from_location_id,
             )
 
-            _item = await item.create(db=db, obj_in=item_in)
-            logger.info(f"Item criado com ID: {_item.id}")
+            # INSERT ... ON CONFLICT (serial): se outro coletor criou o mesmo serial
+            # ao mesmo tempo, o movimento segue sobre o item já existente
+            _item, item_created = await item.upsert(
+                db=db, obj_in=item_in, conflict=['serial'], commit=False)
+            if item_created:
+                logger.info(f"Item criado com ID: {_item.id}")
+            else:
+                logger.info(f"Item {_item.serial} criado em paralelo, usando o ID: {_item.id}")
+                summary_before = await stock_summary_service.snapshot(
+                    db=db, item_ids=[_item.id], lock=True)
             # verifico se o item criado era um serial provisório, se sim. Atualizo na tabela de controle com o item_id
             if payload.item.serial.startswith('ILG'):
                 _provisional_serial = await item_provisional_serial_crud.get_last_by_filters(
@@ -224,10 +249,11 @@ class MovementService:
                     _provisional_serial = await item_provisional_serial_crud.update(
                         db=db,
                         db_obj=_provisional_serial,
-                        obj_in=provisional_serial_update
+                        obj_in=provisional_serial_update,
+                        commit=False
                     )
-                old_order_origin = await crud_origin.get(db=db, id=payload.order_origin_id)
-                new_order_origin_id = await crud_origin.get_last_by_filters(
+                old_order_origin = await crud_origin.get_cached(db=db, id=payload.order_origin_id)
+                new_order_origin_id = await crud_origin.get_last_by_filters_cached(
                     db=db,
                     filters={
                         'origin_name': {'operator': '==', 'value': old_order_origin.origin_name},
@@ -251,7 +277,7 @@ class MovementService:
             extra_info=payload.extra_info,
             created_by=payload.created_by
         )
-        _movement = await movement.create(db=db, obj_in=movement_in)
+        _movement = await movement.create(db=db, obj_in=movement_in, commit=False)
         logger.info(f"Movement criado com ID: {_movement.id}")
         logger.info("Atualizando item...")
 
@@ -269,7 +295,7 @@ class MovementService:
             item_product_update = ItemProductUpdate(
                 product_id=payload.item.product_id
             )
-            _item = await item.update(db=db, db_obj=_item, obj_in=item_product_update)
+            _item = await item.update(db=db, db_obj=_item, obj_in=item_product_update, commit=False)
 
         item_update = ItemUpdate(
             location_id=payload.to_location_id if payload.to_location_id else payload.from_location_id,
@@ -277,6 +303,391 @@ class MovementService:
             last_in_movement_id=last_in_movement_id,
             last_out_movement_id=last_out_movement_id
         )
-        _item = await item.update(db=db, db_obj=_item, obj_in=item_update)
+        _item = await item.update(db=db, db_obj=_item, obj_in=item_update, commit=False)
+
+        summary_after = await stock_summary_service.snapshot(db=db, item_ids=[_item.id])
+        await stock_summary_service.apply(
+            db=db, before=summary_before, after=summary_after, commit=False)
 
         return _item
+
+    BATCH_ITEM_COLUMNS = ["id", "serial", "status", "product_id", "location_id",
+                          "last_in_movement_id", "last_out_movement_id"]
+
+    def _batch_status_error(self, serial: str, movement_type: str, item_status: str) -> Dict[str, str] | None:
+        """Erro do item no lote se o status atual não permite a movimentação."""
+        if movement_type not in ['IN', 'COLLECTED', 'DELIVERY'] and item_status != 'IN_DEPOT':
+            return {
+                "serial": serial,
+                "error": f'Item ({serial}) com status ({item_status}) inválido para esta movimentação.'
+            }
+        return None
+
+    async def create_movement_batch(
+        self,
+        db: Session,
+        payloads: List[MovementPayload],
+        create_types: Tuple[str, ...] = ('IN', 'COLLECTED')
+    ) -> List[Any]:
+        """
+        Versão em lote do create_movement (set-based):
+        1. Resolve todos os seriais com uma única query
+        2. Valida item a item; se houver erro, retorna todos de uma vez (HTTP 400) e nada é gravado.
+           Antes de gravar, os itens existentes são relidos com lock (FOR UPDATE) e o status revalidado
+        3. Itens novos que dependem de regras específicas (consulta síncrona da Cielo e seriais provisórios ILG)
+           seguem pelo create_movement unitário (commit=False), dentro da mesma transação
+        4. Cria os itens novos e os movimentos com INSERT multi-linha e atualiza todos os itens com um único UPDATE,
+           tudo na mesma transação
+        5. Retorna os itens na ordem do payload
+        Serial novo criado ao mesmo tempo por outra requisição volta como erro do item (HTTP 400).
+
+        create_types: tipos de movimentação que podem criar o item caso ele não exista
+        """
+        if not payloads:
+            return []
+
+        logger.info(f"Consultando {len(payloads)} itens em lote...")
+        rows = await item.get_multi_columns(
+            db=db,
+            filters=[{"field": "serial", "operator": "in",
+                      "value": list({p.item.serial for p in payloads})}],
+            columns=self.BATCH_ITEM_COLUMNS
+        )
+        existing: Dict[str, Dict[str, Any]] = {r["serial"]: r for r in rows}
+
+        errors = []
+        seen = set()
+        unitarios: List[MovementPayload] = []
+        novos: List[MovementPayload] = []
+        em_lote: List[MovementPayload] = []
+        for payload in payloads:
+            serial = payload.item.serial
+            movement_type = payload.movement_type.value
+
+            if serial in seen:
+                errors.append({"serial": serial,
+                               "error": "Serial duplicado na lista de itens."})
+                continue
+            seen.add(serial)
+
+            _item = existing.get(serial)
+            if not _item:
+                if movement_type not in create_types:
+                    errors.append({
+                        "serial": serial,
+                        "error": f'Item {serial} não encontrado. Para movimentações diferentes de {", ".join(create_types)}, o item deve existir.'
+                    })
+                elif payload.client_name == 'cielo' or serial.startswith('ILG'):
+                    unitarios.append(payload)
+                elif payload.item.product_id == 0 and movement_type != 'COLLECTED':
+                    errors.append({
+                        "serial": serial,
+                        "error": f'Para movimentações {movement_type}, o product_id deve ser informado.'
+                    })
+                else:
+                    novos.append(payload)
+                continue
+
+            error = self._batch_status_error(serial, movement_type, _item["status"])
+            if error:
+                errors.append(error)
+                continue
+            em_lote.append(payload)
+
+        if errors:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=errors
+            )
+
+        # pré-carrega (em paralelo) a consulta síncrona dos seriais Cielo novos;
+        # o create_movement unitário depois encontra os retornos no cache
+        sap_serials = [p.item.serial for p in unitarios
+                       if p.client_name == 'cielo' and not p.item.serial.startswith('ILG')]
+        if len(sap_serials) > 1:
+            await ConsultaSincrona(client=self.http_client).executar_many(sap_serials)
+
+        if em_lote:
+            # relê os itens existentes travados (FOR UPDATE) e revalida o status:
+            # uma movimentação concorrente pode ter mudado o item depois da leitura
+            # acima (feita sem lock para não segurar as linhas durante a consulta síncrona)
+            locked_rows = await item.get_multi_columns(
+                db=db,
+                filters=[{"field": "id", "operator": "in",
+                          "value": [existing[p.item.serial]["id"] for p in em_lote]}],
+                columns=self.BATCH_ITEM_COLUMNS,
+                lock=True
+            )
+            existing.update({r["serial"]: r for r in locked_rows})
+            errors = [error for error in (
+                self._batch_status_error(p.item.serial, p.movement_type.value,
+                                         existing[p.item.serial]["status"])
+                for p in em_lote) if error]
+            if errors:
+                await db.rollback()
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=errors
+                )
+
+        item_ids: Dict[str, int] = {}
+        summary_before = await stock_summary_service.snapshot(
+            db=db, item_ids=[existing[p.item.serial]["id"] for p in em_lote], lock=True)
+        try:
+            # itens unitários na mesma transação do lote (só o serial provisório
+            # tem commit próprio, numa sessão separada)
+            for payload in unitarios:
+                _item = await self.create_movement(db=db, payload=payload, commit=False)
+                item_ids[payload.item.serial] = _item.id
+
+            if novos:
+                logger.info(f"Criando {len(novos)} itens novos em lote...")
+                created = await item.create_multi_returning(
+                    db=db,
+                    rows=[{
+                        "product_id": p.item.product_id if p.item.product_id != 0 else None,
+                        "serial": p.item.serial,
+                        "status": self._get_status(p.movement_type.value),
+                        "extra_info": p.item.extra_info,
+                        "location_id": p.to_location_id if p.to_location_id else p.from_location_id,
+                    } for p in novos],
+                    returning=["id", "serial", "status", "product_id", "location_id",
+                               "last_in_movement_id", "last_out_movement_id"],
+                    commit=False
+                )
+                existing.update({r["serial"]: r for r in created})
+                em_lote.extend(novos)
+
+            if em_lote:
+                logger.info(f"Criando {len(em_lote)} movements em lote...")
+                created_movements = await movement.create_multi_returning(
+                    db=db,
+                    rows=[{
+                        "movement_type": p.movement_type.value,
+                        "item_id": existing[p.item.serial]["id"],
+                        "order_origin_id": p.order_origin_id,
+                        "from_location_id": p.from_location_id,
+                        "to_location_id": p.to_location_id if p.to_location_id else None,
+                        "order_number": p.order_number,
+                        "volume_number": p.volume_number,
+                        "kit_number": p.kit_number,
+                        "extra_info": p.extra_info,
+                        "created_by": p.created_by,
+                    } for p in em_lote],
+                    returning=["id", "item_id"],
+                    commit=False
+                )
+                movement_by_item = {
+                    r["item_id"]: r["id"] for r in created_movements}
+
+                logger.info("Atualizando itens em lote...")
+                item_updates = []
+                for p in em_lote:
+                    _item = existing[p.item.serial]
+                    movement_id = movement_by_item[_item["id"]]
+                    is_in = p.movement_type.value == 'IN'
+                    product_id = _item["product_id"]
+                    if product_id is None and p.item.product_id:
+                        product_id = p.item.product_id
+                    item_updates.append({
+                        "id": _item["id"],
+                        "location_id": p.to_location_id if p.to_location_id else p.from_location_id,
+                        "status": self._get_status(p.movement_type.value),
+                        "product_id": product_id,
+                        "last_in_movement_id": movement_id if is_in else _item["last_in_movement_id"],
+                        "last_out_movement_id": _item["last_out_movement_id"] if is_in else movement_id,
+                    })
+                    item_ids[p.item.serial] = _item["id"]
+                await item.update_multi_by_id(db=db, rows=item_updates, commit=False)
+
+                summary_after = await stock_summary_service.snapshot(
+                    db=db, item_ids=[r["id"] for r in item_updates])
+                await stock_summary_service.apply(
+                    db=db, before=summary_before, after=summary_after, commit=False)
+
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            # outro lote/coletor criou ao mesmo tempo um dos seriais novos (UNIQUE serial):
+            # devolve como erro do item, no mesmo formato das demais validações
+            created_by_others = await item.get_multi_columns(
+                db=db,
+                filters=[{"field": "serial", "operator": "in",
+                          "value": [p.item.serial for p in novos + unitarios]}],
+                columns=["serial"]
+            )
+            if not created_by_others:
+                raise
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=[{
+                    "serial": r["serial"],
+                    "error": f'Item {r["serial"]} foi criado por outra requisição simultânea. Reenvie a movimentação.'
+                } for r in created_by_others]
+            )
+        except Exception:
+            await db.rollback()
+            raise
+
+        # Recarrego os itens já com a posição final
+        db.expire_all()
+        _items = await item.get_multi_filters(
+            db=db,
+            filters=[{"field": "id", "operator": "in",
+                      "value": list(item_ids.values())}]
+        )
+        items_by_id = {_item.id: _item for _item in _items}
+        return [items_by_id[item_ids[p.item.serial]] for p in payloads]
+
+    async def finish_romaneio(
+        self,
+        db: Session,
+        romaneio: Any,
+        finish_data: RomaneioFinisheData,
+        order_origin_id: int | None = None,
+        chunk_size: int | None = None,
+        on_progress: Callable[[Dict[str, Any]], None] | None = None
+    ) -> Dict[str, Any]:
+        """
+        Finaliza o romaneio em lote:
+        1. Carrega os itens do romaneio (com status e movimentos do item) numa única query
+        2. Ignora itens que já receberam o movimento de saída deste romaneio (reprocessamento)
+        3. Valida todos os itens; se houver erro, retorna todos de uma vez (HTTP 400) e nada é gravado
+        4. Cria os movimentos TRANSFER/RETURN com INSERT multi-linha, atualiza a posição dos itens
+           com um único UPDATE e fecha o romaneio, tudo no mesmo commit
+
+        Com chunk_size (modo job), os itens são gravados em blocos com um commit por bloco,
+        itens inválidos são contabilizados como falha em vez de abortar, on_progress é chamado
+        a cada bloco e o romaneio só é fechado se nenhum item falhar.
+        """
+        movement_type = finish_data.movement_type.value
+        item_status_required = self._get_status(movement_type)
+        romaneio_id = romaneio.id
+        romaneio_number = romaneio.romaneio_number
+        origin_id = romaneio.origin_id
+        destination_id = romaneio.destination_id
+
+        logger.info("Consultando itens do romaneio...")
+        rom_items = await romaneio_crud_item.get_multi_columns(
+            db=db,
+            filters=[{"field": "romaneio_id", "operator": "=",
+                      "value": romaneio_id}],
+            columns=["id", "volume_number", "kit_number",
+                     "item.id", "item.serial", "item.status",
+                     "item.last_out_movement.order_number",
+                     "item.last_out_movement.movement_type"]
+        )
+        if not rom_items:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='Nenhum item encontrado para esse romaneio.'
+            )
+
+        errors = []
+        pendentes = []
+        skipped = 0
+        for rom_item in rom_items:
+            ja_processado = (
+                rom_item["item_status"] == item_status_required
+                and rom_item["item_last_out_movement_order_number"] == romaneio_number
+                and rom_item["item_last_out_movement_movement_type"] == movement_type
+            )
+            if ja_processado:
+                skipped += 1
+                continue
+            if rom_item["item_status"] != 'IN_DEPOT':
+                errors.append({
+                    "serial": rom_item["item_serial"],
+                    "error": f'Item ({rom_item["item_serial"]}) com status ({rom_item["item_status"]}) inválido para esta movimentação.'
+                })
+                continue
+            pendentes.append(rom_item)
+
+        if errors and not chunk_size:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=errors
+            )
+
+        _extra_info = {
+            "external_order_number": finish_data.external_order_number
+        } if finish_data.external_order_number else None
+        location_id = destination_id if destination_id else origin_id
+
+        size = chunk_size or max(len(pendentes), 1)
+        chunks = [pendentes[i:i + size]
+                  for i in range(0, max(len(pendentes), 1), size)]
+        processed = 0
+        for idx, chunk in enumerate(chunks):
+            try:
+                if chunk:
+                    summary_before = await stock_summary_service.snapshot(
+                        db=db, item_ids=[r["item_id"] for r in chunk], lock=True)
+                    logger.info(
+                        f"Criando {len(chunk)} movements do romaneio em lote...")
+                    created_movements = await movement.create_multi_returning(
+                        db=db,
+                        rows=[{
+                            "movement_type": movement_type,
+                            "item_id": r["item_id"],
+                            "order_origin_id": order_origin_id,
+                            "from_location_id": origin_id,
+                            "to_location_id": destination_id,
+                            "order_number": romaneio_number,
+                            "volume_number": int(r["volume_number"]) if r["volume_number"] else None,
+                            "kit_number": r["kit_number"],
+                            "extra_info": _extra_info,
+                            "created_by": finish_data.finished_by,
+                        } for r in chunk],
+                        returning=["id", "item_id"],
+                        commit=False
+                    )
+
+                    logger.info("Atualizando posição dos itens em lote...")
+                    await item.update_multi_by_id(
+                        db=db,
+                        rows=[{
+                            "id": r["item_id"],
+                            "location_id": location_id,
+                            "status": item_status_required,
+                            "last_out_movement_id": r["id"],
+                        } for r in created_movements],
+                        commit=False
+                    )
+
+                    summary_after = await stock_summary_service.snapshot(
+                        db=db, item_ids=[r["item_id"] for r in chunk])
+                    await stock_summary_service.apply(
+                        db=db, before=summary_before, after=summary_after, commit=False)
+
+                # renova a reserva da finalização (ver claim_for_finish)
+                await romaneio_crud.renew_finish_claim(db=db, id=romaneio_id)
+                # fecha o romaneio no mesmo commit do último bloco de movimentos
+                if idx == len(chunks) - 1 and not errors:
+                    await romaneio_crud.update_multi_by_id(
+                        db=db,
+                        rows=[{"id": romaneio_id, "status_rom": 'FECHADO'}],
+                        commit=False
+                    )
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                if not chunk_size:
+                    raise
+                logger.error(f"Erro ao finalizar bloco do romaneio: {e}")
+                errors.extend({"serial": r["item_serial"], "error": str(e)}
+                              for r in chunk)
+            else:
+                processed += len(chunk)
+
+            if on_progress:
+                on_progress({"total": len(rom_items),
+                             "processed": processed, "failed": len(errors)})
+
+        return {
+            "total": len(rom_items),
+            "processed": processed,
+            "skipped": skipped,
+            "failed": len(errors),
+            "errors": errors,
+        }
@@ -9,7 +9,8 @@ from crud.crud_movement import movement as movement_crud
 from crud.crud_romaneio_item import romaneio_crud_item as romaneio_item
 from crud.crud_romaneio import romaneio_crud as romaneio
 from schemas.romaneio_item_schema import RomaneioItemPayload, RomaneioItemCreate, RomaneioItemInDbBase
-from schemas.romaneio_item_schema import RomaneioItemResponse, RomaneioItemVolum, RomaneioItemKit
+from schemas.romaneio_item_schema import RomaneioItemResponse, RomaneioItemVolum, RomaneioItemKit, RomaneioItemDeltaResponse
+from schemas.romaneio_item_schema import RomaneioItemBulkPayload, RomaneioItemBulkResult, RomaneioItemBulkResponse
 
 
 from api import deps
@@ -23,7 +24,35 @@ class RomaneioItemService:
     def __init__(self, reverse: bool = True) -> None:
         self.reverse = reverse
 
-    def build_romaneio_response(self, romaneio_list, romaneio: RomaneioInDbBase, show_products: bool = False):
+    def build_romaneio_response(self, romaneio_list, romaneio: RomaneioInDbBase, show_products: bool = False, version: int | None = None):
+        return RomaneioItemResponse(
+            romaneio=str(romaneio_list[0].romaneio.romaneio_number),
+            status=romaneio.status_rom,
+            location_id=romaneio.location_id,
+            location=romaneio.location.nome if romaneio.location else None,
+            origin_id=romaneio.origin_id,
+            origin=romaneio.origin.nome if romaneio.origin else None,
+            destination_id=romaneio.destination_id,
+            destination=romaneio.destination.nome if romaneio.destination else None,
+            volums=self.build_volumes(romaneio_list, show_products),
+            version=romaneio.version if version is None else version
+        )
+
+    def build_empty_response(self, romaneio_in: str, romaneio: RomaneioInDbBase, version: int | None = None):
+        return RomaneioItemResponse(
+            romaneio=romaneio_in,
+            status=romaneio.status_rom,
+            location_id=romaneio.location_id,
+            location=romaneio.location.nome if romaneio.location else None,
+            origin_id=romaneio.origin_id,
+            origin=romaneio.origin.nome if romaneio.origin else None,
+            destination_id=romaneio.destination_id,
+            destination=romaneio.destination.nome if romaneio.destination else None,
+            volums=[],
+            version=romaneio.version if version is None else version
+        )
+
+    def build_volumes(self, romaneio_list, show_products: bool = False) -> List[RomaneioItemVolum]:
         volumes_dict = {}
 
         for idx, item in enumerate(romaneio_list, start=1):
@@ -63,23 +92,61 @@ class RomaneioItemService:
                 )
             )
 
-        return RomaneioItemResponse(
-            romaneio=str(romaneio_list[0].romaneio.romaneio_number),
+        return volumes
+
+    async def build_romaneio_delta(
+        self,
+        db: Session,
+        romaneio: RomaneioInDbBase,
+        volume_number: str,
+        version: int,
+        action: str,
+        romaneio_item_id: int | None = None
+    ) -> RomaneioItemDeltaResponse:
+        """
+        Resposta incremental de um scan: recarrega só os itens do volume afetado
+        (em vez do romaneio inteiro) e devolve o volume e o kit alterado.
+        """
+        volume_items = await romaneio_item.get_multi_filters(
+            db=db,
+            filters=[
+                {"field": "romaneio_id", "operator": "=", "value": romaneio.id},
+                {"field": "volume_number", "operator": "=", "value": volume_number},
+            ]
+        )
+        volumes = self.build_volumes(volume_items)
+        volum = volumes[0] if volumes else RomaneioItemVolum(
+            volum_number=str(volume_number), kits=[])
+        kit = next(
+            (k for k in volum.kits if k.id == romaneio_item_id), None)
+
+        return RomaneioItemDeltaResponse(
+            romaneio=str(romaneio.romaneio_number),
             status=romaneio.status_rom,
-            location_id=romaneio.location_id,
-            location=romaneio.location.nome if romaneio.location else None,
-            origin_id=romaneio.origin_id,
-            origin=romaneio.origin.nome if romaneio.origin else None,
-            destination_id=romaneio.destination_id,
-            destination=romaneio.destination.nome if romaneio.destination else None,
-            volums=volumes
+            version=version,
+            action=action,
+            volum=volum,
+            kit=kit
         )
 
-    async def insere_novo_item(self, db: Session, romaneio_in: str, item: RomaneioItemPayload):
+    async def insere_novo_item(
+        self,
+        db: Session,
+        romaneio_in: str,
+        item: RomaneioItemPayload,
+        incremental: bool = False,
+        known_version: int | None = None
+    ):
+        """
+        Com incremental=True e known_version igual à versão imediatamente anterior
+        à deste scan (cliente sincronizado), retorna só o delta do volume; senão
+        (inclusive se o item já estava no romaneio) retorna o romaneio inteiro.
+        """
         logger.info("Consulta o romaneio")
 
         existing_romaneio = await romaneio.get_last_by_filters(
             db=db,
+            load="listing",
             filters={
                 'romaneio_number': {'operator': '==', 'value': romaneio_in},
             }
@@ -140,14 +207,16 @@ class RomaneioItemService:
                 'item_id': {'operator': '==', 'value': last_movement.item_id},
                 'romaneio.status_rom': {'operator': 'in', 'value': ['ABERTO', 'PRONTO']},
                 'romaneio.id': {'operator': '!=', 'value': existing_romaneio.id}
-            }
+            },
+            load="minimal"
         )
         existing_romaneio_item = await romaneio_item.get_last_by_filters(
             db=db,
             filters={
                 'romaneio_id': {'operator': '==', 'value': existing_romaneio.id},
                 'item_id': {'operator': '==', 'value': last_movement.item_id}
-            })
+            },
+            load="minimal")
 
         if existing_outher_romaneio_item and not existing_romaneio_item:
             raise HTTPException(
@@ -155,18 +224,23 @@ class RomaneioItemService:
                 detail=f"Item {last_movement.item.serial} já atrelado a outro romaneio em ABERTO ou PRONTO (Id do Romaneio: {existing_outher_romaneio_item.romaneio_id})",
             )
 
+        version = existing_romaneio.version
+        new_obj = None
         if not existing_romaneio_item:
-            filters = [
-                {"field": "romaneio_id", "operator": "=",
-                    "value": existing_romaneio.id},
-                {"field": "volume_number", "operator": "=",
-                    "value": item.volume_number}
-            ]
-            _itens_volume = await romaneio_item.get_multi_filters(
+            # versão incrementada no mesmo commit do insert; o UPDATE trava o romaneio,
+            # então dois scans simultâneos no mesmo volume não pegam o mesmo kit
+            version = await romaneio.bump_version(db=db, id=existing_romaneio.id)
+            if version is None:
+                # o romaneio saiu de ABERTO depois da leitura acima (finalização reservada)
+                await db.rollback()
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Romaneio não está mais ABERTO (em finalização ou fechado)",
+                )
+            new_kit_number = await romaneio_item.next_kit_number(
                 db=db,
-                filters=filters)
-
-            new_kit_number = len(_itens_volume)+1
+                romaneio_id=existing_romaneio.id,
+                volume_number=item.volume_number)
             obj_romaneio_item = RomaneioItemCreate(
                 romaneio_id=existing_romaneio.id,
                 item_id=last_movement.item_id,
@@ -178,9 +252,167 @@ class RomaneioItemService:
 
             new_obj = await romaneio_item.create(db=db, obj_in=obj_romaneio_item)
 
+        # o delta só vale se o cliente estava exatamente na versão anterior ao
+        # nosso incremento (lido do UPDATE ... RETURNING, já com o romaneio travado);
+        # sem incremento (item já no romaneio) a versão lida não é confiável
+        if incremental and new_obj and known_version is not None and known_version == version - 1:
+            return await self.build_romaneio_delta(
+                db=db,
+                romaneio=existing_romaneio,
+                volume_number=new_obj.volume_number,
+                version=version,
+                action='added',
+                romaneio_item_id=new_obj.id
+            )
+
         # consulto o romaneio atualizado e retorno a lista de items atrelados a ele
         romaneio_list = await romaneio_item.get_multi_filter(db=db, filterby="romaneio_id", filter=existing_romaneio.id)
-        return self.build_romaneio_response(romaneio_list, existing_romaneio)
+        return self.build_romaneio_response(romaneio_list, existing_romaneio, version=version)
+
+    async def insere_itens_em_lote(self, db: Session, romaneio_in: str, payload: RomaneioItemBulkPayload) -> RomaneioItemBulkResponse:
+        """
+        Versão em lote do insere_novo_item, com as mesmas regras:
+        1. Último movimento (não ADJUST) de todos os seriais com uma única query (DISTINCT ON item)
+        2. Vínculos dos itens com romaneios ativos (este ou outros) com uma única query
+        3. Kits numerados em sequência a partir do maior kit atual do volume, com o romaneio travado
+        4. Um único INSERT para todos os itens aceitos e uma única montagem da resposta
+        Cada serial volta com aceito/recusado e o motivo, sem interromper o lote.
+        """
+        logger.info("Consulta o romaneio")
+        existing_romaneio = await romaneio.get_last_by_filters(
+            db=db,
+            load="listing",
+            filters={
+                'romaneio_number': {'operator': '==', 'value': romaneio_in},
+            }
+        )
+        if not existing_romaneio:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="romaneio not found")
+
+        if existing_romaneio.status_rom != 'ABERTO':
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Romaneio inativo (Só é permitido inserir itens em romaneios com status 'ABERTO')",
+            )
+
+        # faço upper nos seriais para evitar problemas com letras minusculas
+        serials = [serial.upper() for serial in payload.serials]
+
+        logger.info("Consulta o último movimento dos itens pelo serial e client")
+        filters = [
+            {"field": "item.serial", "operator": "in", "value": list(set(serials))},
+            {"field": "item.product.client.client_code",
+                "operator": "=", "value": payload.client},
+            {"field": "item.status", "operator": "=", "value": "IN_DEPOT"},
+            {"field": "movement_type", "operator": "!=", "value": "ADJUST"},
+        ]
+        if payload.location_id != 0:
+            filters.append({"field": "item.location_id",
+                           "operator": "=", "value": payload.location_id})
+        last_movements = await movement_crud.get_multi_columns(
+            db=db,
+            filters=filters,
+            columns=["item_id", "movement_type",
+                     "order_number", "item.serial"],
+            distinct_on="item_id",
+            order_by="id",
+            order_desc=True
+        )
+        movement_by_serial = {m["item_serial"]: m for m in last_movements}
+
+        logger.info("Consulta os vínculos dos itens com romaneios ativos")
+        vinculos = await romaneio_item.get_multi_columns(
+            db=db,
+            filters=[
+                {"field": "item_id", "operator": "in",
+                    "value": [m["item_id"] for m in last_movements] or [0]},
+                {"field": "romaneio.status_rom", "operator": "in",
+                    "value": ['ABERTO', 'PRONTO']},
+            ],
+            columns=["item_id", "romaneio_id"]
+        )
+        no_romaneio = {v["item_id"] for v in vinculos
+                       if v["romaneio_id"] == existing_romaneio.id}
+        em_outro_romaneio = {v["item_id"]: v["romaneio_id"] for v in vinculos
+                             if v["romaneio_id"] != existing_romaneio.id}
+
+        results: List[RomaneioItemBulkResult] = []
+        novos = []
+        vistos = set()
+        for serial in serials:
+            if serial in vistos:
+                results.append(RomaneioItemBulkResult(
+                    serial=serial, accepted=False, detail="Serial duplicado na lista"))
+                continue
+            vistos.add(serial)
+
+            last_movement = movement_by_serial.get(serial)
+            if not last_movement:
+                results.append(RomaneioItemBulkResult(
+                    serial=serial, accepted=False,
+                    detail="Item not found (O serial informado não existe, não pertence a este cliente ou não está com status 'IN_DEPOT')"))
+                continue
+            if last_movement["movement_type"] != 'IN':
+                results.append(RomaneioItemBulkResult(
+                    serial=serial, accepted=False,
+                    detail="Item sem pedido (O item não possui um movimento de entrada associado)"))
+                continue
+
+            item_id = last_movement["item_id"]
+            if item_id in no_romaneio:
+                # item já está no romaneio: ignora a inserção
+                results.append(RomaneioItemBulkResult(
+                    serial=serial, accepted=True, detail="Item já está no romaneio"))
+                continue
+            if item_id in em_outro_romaneio:
+                results.append(RomaneioItemBulkResult(
+                    serial=serial, accepted=False,
+                    detail=f"Item {serial} já atrelado a outro romaneio em ABERTO ou PRONTO (Id do Romaneio: {em_outro_romaneio[item_id]})"))
+                continue
+
+            result = RomaneioItemBulkResult(serial=serial, accepted=True)
+            novos.append((result, {
+                "romaneio_id": existing_romaneio.id,
+                "item_id": item_id,
+                "created_by": payload.create_by,
+                "volume_number": payload.volume_number,
+                "order_number": last_movement["order_number"],
+            }))
+            results.append(result)
+
+        version = existing_romaneio.version
+        if novos:
+            logger.info(f"Inserindo {len(novos)} itens no romaneio em lote")
+            # o UPDATE da versão trava o romaneio: a numeração dos kits parte do
+            # MAX atual do volume sem disputar com outros scans simultâneos
+            version = await romaneio.bump_version(db=db, id=existing_romaneio.id)
+            if version is None:
+                # o romaneio saiu de ABERTO depois da leitura acima (finalização reservada)
+                await db.rollback()
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Romaneio não está mais ABERTO (em finalização ou fechado)",
+                )
+            next_kit_number = await romaneio_item.next_kit_number(
+                db=db,
+                romaneio_id=existing_romaneio.id,
+                volume_number=payload.volume_number)
+            rows = []
+            for kit_number, (result, row) in enumerate(novos, start=next_kit_number):
+                result.kit_number = str(kit_number)
+                rows.append({**row, "kit_number": str(kit_number)})
+            await romaneio_item.create_multi_returning(db=db, rows=rows, returning=["id"])
+
+        # consulto o romaneio atualizado uma única vez
+        romaneio_list = await romaneio_item.get_multi_filter(db=db, filterby="romaneio_id", filter=existing_romaneio.id)
+        if romaneio_list:
+            response = self.build_romaneio_response(
+                romaneio_list, existing_romaneio, version=version)
+        else:
+            response = self.build_empty_response(
+                romaneio_in, existing_romaneio, version=version)
+        return RomaneioItemBulkResponse(results=results, romaneio=response)
 
     async def consulta_romaneio(self, db: Session, romaneio_in: str, location_id: int = 0, show_products: bool = False):
         logger.info("Consulta o romaneio")
@@ -193,6 +425,7 @@ class RomaneioItemService:
         if location_id != 0:
             existing_romaneio = await romaneio.get_last_by_filters(
                 db=db,
+                load="listing",
                 filters={
                     'romaneio_number': {'operator': '==', 'value': romaneio_in},
                     'location_id': {'operator': '==', 'value': location_id},
@@ -201,6 +434,7 @@ class RomaneioItemService:
         else:
             existing_romaneio = await romaneio.get_last_by_filters(
                 db=db,
+                load="listing",
                 filters={
                     'romaneio_number': {'operator': '==', 'value': romaneio_in},
                 }
@@ -212,15 +446,5 @@ class RomaneioItemService:
         # consulto o romaneio atualizado e retorno a lista de items atrelados a ele
         romaneio_list = await romaneio_item.get_multi_filter(db=db, filterby="romaneio_id", filter=romaneio_id)
         if not romaneio_list:
-            return RomaneioItemResponse(
-                romaneio=romaneio_in,
-                status=existing_romaneio.status_rom,
-                location_id=existing_romaneio.location_id,
-                location=existing_romaneio.location.nome if existing_romaneio.location else None,
-                origin_id=existing_romaneio.origin_id,
-                origin=existing_romaneio.origin.nome if existing_romaneio.origin else None,
-                destination_id=existing_romaneio.destination_id,
-                destination=existing_romaneio.destination.nome if existing_romaneio.destination else None,
-                volums=[]
-            )
+            return self.build_empty_response(romaneio_in, existing_romaneio)
         return self.build_romaneio_response(romaneio_list, existing_romaneio, show_products)
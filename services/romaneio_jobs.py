@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from core.config import settings
+from crud.crud_romaneio import romaneio_crud
+from db.session import SessionLocal_psql
+from schemas.romaneio_schema import RomaneioFinishJobStatus, RomaneioFinisheData
+from services.movement import MovementService
+
+logger = logging.getLogger(__name__)
+
+
+class RomaneioFinishJobs:
+    """
+    Controle dos jobs de finalização de romaneio em background.
+
+    Os jobs ficam em memória (por processo), então o status do job só é
+    visível no worker que o recebeu. O estado durável continua sendo o
+    status_rom do romaneio ('EM PROCESSAMENTO' enquanto o job roda).
+    """
+
+    def __init__(self, max_jobs: int, history: int) -> None:
+        self._jobs: "OrderedDict[str, RomaneioFinishJobStatus]" = OrderedDict()
+        self._semaphore = asyncio.Semaphore(max_jobs)
+        self._history = history
+
+    def create(self, romaneio_number: str) -> RomaneioFinishJobStatus:
+        job = RomaneioFinishJobStatus(
+            job_id=uuid.uuid4().hex,
+            romaneio_number=romaneio_number,
+            status='PENDENTE',
+            created_at=datetime.now(timezone.utc)
+        )
+        self._jobs[job.job_id] = job
+        # descarto os jobs mais antigos
+        while len(self._jobs) > self._history:
+            self._jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id: str) -> Optional[RomaneioFinishJobStatus]:
+        return self._jobs.get(job_id)
+
+    async def run(
+        self,
+        job_id: str,
+        romaneio_id: int,
+        finish_data: RomaneioFinisheData,
+        order_origin_id: Optional[int] = None
+    ) -> None:
+        """
+        Executa a finalização em blocos, com no máximo ROMANEIO_FINISH_MAX_JOBS
+        jobs simultâneos. Usa uma sessão própria, pois a sessão da request já
+        foi fechada quando a background task roda.
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            # job descartado do histórico antes de começar: segue sem progresso
+            logger.warning(f"Job {job_id} não encontrado no histórico; finalizando sem acompanhamento")
+            job = RomaneioFinishJobStatus(
+                job_id=job_id,
+                romaneio_number='',
+                status='PENDENTE',
+                created_at=datetime.now(timezone.utc)
+            )
+
+        def on_progress(progress: Dict[str, Any]) -> None:
+            job.total = progress["total"]
+            job.processed = progress["processed"]
+            job.failed = progress["failed"]
+
+        async with self._semaphore:
+            job.status = 'EM PROCESSAMENTO'
+            async with SessionLocal_psql() as db:
+                try:
+                    _romaneio = await romaneio_crud.get(db=db, id=romaneio_id)
+                    result = await MovementService().finish_romaneio(
+                        db=db,
+                        romaneio=_romaneio,
+                        finish_data=finish_data,
+                        order_origin_id=order_origin_id,
+                        chunk_size=settings.ROMANEIO_FINISH_CHUNK_SIZE,
+                        on_progress=on_progress
+                    )
+                    job.total = result["total"]
+                    job.processed = result["processed"]
+                    job.failed = result["failed"]
+                    job.errors = result["errors"]
+                    job.status = 'CONCLUIDO COM ERROS' if result["failed"] else 'CONCLUIDO'
+                    if result["failed"]:
+                        # romaneio não foi fechado: libera para reprocessar
+                        await romaneio_crud.release_finish(db=db, id=romaneio_id)
+                except BaseException as e:
+                    logger.error(
+                        f"Erro no job {job_id} de finalização do romaneio {job.romaneio_number}: {e}")
+                    job.status = 'ERRO'
+                    job.errors = [{"error": str(getattr(e, "detail", e))}]
+                    await db.rollback()
+                    await romaneio_crud.release_finish(db=db, id=romaneio_id)
+                    if not isinstance(e, Exception):
+                        raise
+            job.finished_at = datetime.now(timezone.utc)
+
+
+romaneio_finish_jobs = RomaneioFinishJobs(
+    max_jobs=settings.ROMANEIO_FINISH_MAX_JOBS,
+    history=settings.ROMANEIO_FINISH_JOBS_HISTORY
+)
@@ -0,0 +1,387 @@
+import codecs
+import csv
+import json
+import logging
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from schemas.item_schema import ItemStatus
+from schemas.movement_schema import MovementType
+from schemas.stock_import_schema import StockImportReject, StockImportResult
+
+logger = logging.getLogger(__name__)
+
+STAGING_TABLE = "stock_import_staging"
+
+# (linha do arquivo, serial, sku, location_id, order_origin_id, order_number, volume_number, kit_number, extra_info)
+StagingRecord = Tuple[int, str, str, int, Optional[int],
+                      Optional[str], Optional[int], Optional[str], Optional[str]]
+
+
+class _LineFeed(deque):
+    """Fila de linhas lida pelo csv.reader; vazia, só encerra a leitura atual."""
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self:
+            raise StopIteration
+        return self.popleft()
+
+
+class StockImportService:
+    """
+    Carga inicial de estoque em massa (CSV ou JSONL).
+
+    As linhas válidas são enviadas por COPY (asyncpg copy_records_to_table) para
+    uma tabela temporária e incorporadas com SQL set-based, tudo numa única
+    transação: validações (UPDATE ... SET reject), INSERT dos items, INSERT dos
+    movimentos de entrada, vínculo do last_in_movement e posição de estoque.
+    Nenhum objeto ORM é montado e o arquivo nunca fica inteiro em memória.
+
+    Colunas: serial, sku, location_id (obrigatórias), order_origin_id,
+    order_number, volume_number, kit_number e extra_info (JSON).
+    Serial que já existe no estoque é recusado (a carga não altera items existentes).
+    """
+
+    COLUMNS = ["serial", "sku", "location_id", "order_origin_id", "order_number",
+               "volume_number", "kit_number", "extra_info"]
+    REQUIRED = ["serial", "sku", "location_id"]
+    INT_COLUMNS = ["location_id", "order_origin_id", "volume_number"]
+    STAGING_COLUMNS = ["line"] + COLUMNS
+
+    # validações em ordem; cada uma só marca linhas ainda não recusadas
+    VALIDATIONS = [
+        ("Serial duplicado no arquivo", f"""
+            UPDATE {STAGING_TABLE} s SET reject = :reason
+            FROM (SELECT line, row_number() OVER (PARTITION BY serial ORDER BY line) AS rn
+                  FROM {STAGING_TABLE}) d
+            WHERE s.line = d.line AND d.rn > 1 AND s.reject IS NULL
+        """),
+        ("Produto não encontrado (sku)", f"""
+            UPDATE {STAGING_TABLE} s SET reject = :reason
+            WHERE s.reject IS NULL AND s.product_id IS NULL
+        """),
+        ("Local não encontrado (location_id)", f"""
+            UPDATE {STAGING_TABLE} s SET reject = :reason
+            WHERE s.reject IS NULL AND NOT EXISTS (
+                SELECT 1 FROM logistica_groupaditionalinformation l WHERE l.id = s.location_id)
+        """),
+        ("Origem não encontrada (order_origin_id)", f"""
+            UPDATE {STAGING_TABLE} s SET reject = :reason
+            WHERE s.reject IS NULL AND s.order_origin_id IS NOT NULL AND NOT EXISTS (
+                SELECT 1 FROM logistic_stock_order_origin o WHERE o.id = s.order_origin_id)
+        """),
+        ("Serial já existe no estoque", f"""
+            UPDATE {STAGING_TABLE} s SET reject = :reason
+            WHERE s.reject IS NULL AND EXISTS (
+                SELECT 1 FROM logistic_stock_item i WHERE i.serial = s.serial)
+        """),
+    ]
+
+    def __init__(
+        self,
+        created_by: str,
+        order_origin_id: Optional[int] = None,
+        dry_run: bool = False,
+        batch_size: Optional[int] = None,
+        max_rejects: Optional[int] = None,
+    ):
+        self.created_by = created_by
+        # origem usada nas linhas sem order_origin_id
+        self.order_origin_id = order_origin_id
+        self.dry_run = dry_run
+        self.batch_size = batch_size or settings.STOCK_IMPORT_COPY_BATCH_SIZE
+        self.max_rejects = max_rejects or settings.STOCK_IMPORT_MAX_REJECTS
+        self.rejects: List[StockImportReject] = []
+        self.rejected = 0
+
+    # ----------------------
+    # Leitura do arquivo
+    # ----------------------
+    @staticmethod
+    async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+        """Quebra o stream de bytes em linhas (UTF-8, com ou sem BOM)."""
+        decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        pending = ""
+        async for chunk in chunks:
+            pending += decoder.decode(chunk)
+            lines = pending.split("\n")
+            pending = lines.pop()
+            for line in lines:
+                yield line.rstrip("\r")
+        pending += decoder.decode(b"", final=True)
+        if pending:
+            yield pending.rstrip("\r")
+
+    async def _iter_rows(
+        self, chunks: AsyncIterator[bytes], format: Literal['csv', 'jsonl']
+    ) -> AsyncIterator[Tuple[int, Any]]:
+        """(número da linha, dict) de cada registro; linha ilegível vem como str (erro)."""
+        if format == 'jsonl':
+            line_number = 0
+            async for line in self._iter_lines(chunks):
+                line_number += 1
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_number, f"JSON inválido: {e.msg}"
+                    continue
+                yield line_number, row if isinstance(row, dict) else "A linha deve ser um objeto JSON"
+            return
+
+        # um único csv.reader alimentado pelas linhas do stream: campos entre aspas
+        # com quebra de linha (comuns em exports do Excel) ocupam várias linhas
+        # físicas. O reader só é chamado quando as linhas pendentes fecham todas
+        # as aspas (quantidade par de '"'), ou seja, quando há registro completo;
+        # o número da linha de cada registro vem do reader.line_num.
+        feed = _LineFeed()
+        reader = csv.reader(feed)
+        header: Optional[List[str]] = None
+        quotes = 0
+        line_number = 1
+        async for line in self._iter_lines(chunks):
+            feed.append(line + "\n")
+            quotes += line.count('"')
+            if quotes % 2:
+                continue
+            quotes = 0
+            while feed:
+                values = next(reader)
+                record_line, line_number = line_number, reader.line_num + 1
+                if not any(value.strip() for value in values):
+                    continue
+                if header is None:
+                    header = [value.strip().lower() for value in values]
+                    missing = [col for col in self.REQUIRED if col not in header]
+                    if missing:
+                        raise ValueError(
+                            f"Colunas obrigatórias ausentes no cabeçalho: {', '.join(missing)}")
+                    continue
+                if len(values) != len(header):
+                    yield record_line, f"Esperadas {len(header)} colunas, encontradas {len(values)}"
+                    continue
+                yield record_line, dict(zip(header, values))
+
+        if feed:
+            yield line_number, "Campo entre aspas não fechado até o fim do arquivo"
+
+    def _record(self, line: int, row: Dict[str, Any]) -> StagingRecord:
+        """Valida os tipos da linha e monta o registro do COPY (levanta ValueError)."""
+        data: Dict[str, Any] = {}
+        for col in self.COLUMNS:
+            value = row.get(col)
+            if isinstance(value, str):
+                value = value.strip()
+            data[col] = None if value in ('', None) else value
+
+        for col in self.REQUIRED:
+            if data[col] is None:
+                raise ValueError(f"Campo {col} obrigatório")
+        for col in self.INT_COLUMNS:
+            if data[col] is not None:
+                try:
+                    data[col] = int(data[col])
+                except (TypeError, ValueError):
+                    raise ValueError(f"Campo {col} inválido: {data[col]!r}")
+
+        extra_info = data["extra_info"]
+        if isinstance(extra_info, str):
+            try:
+                extra_info = json.loads(extra_info)
+            except json.JSONDecodeError:
+                raise ValueError("Campo extra_info não é um JSON válido")
+        if extra_info is not None and not isinstance(extra_info, dict):
+            raise ValueError("Campo extra_info deve ser um objeto JSON")
+
+        return (
+            line,
+            str(data["serial"]),
+            str(data["sku"]),
+            data["location_id"],
+            data["order_origin_id"] if data["order_origin_id"] is not None else self.order_origin_id,
+            None if data["order_number"] is None else str(data["order_number"]),
+            data["volume_number"],
+            None if data["kit_number"] is None else str(data["kit_number"]),
+            # jsonb vai como texto no COPY
+            None if extra_info is None else json.dumps(extra_info, ensure_ascii=False),
+        )
+
+    def _reject(self, line: int, serial: Optional[str], reason: str) -> None:
+        self.rejected += 1
+        if len(self.rejects) < self.max_rejects:
+            self.rejects.append(StockImportReject(
+                line=line, serial=serial, reason=reason))
+
+    # ----------------------
+    # Staging + merge
+    # ----------------------
+    async def _create_staging(self, db: Session) -> None:
+        await db.execute(text(f"""
+            CREATE TEMP TABLE {STAGING_TABLE} (
+                line integer PRIMARY KEY,
+                serial text NOT NULL,
+                sku text NOT NULL,
+                location_id integer NOT NULL,
+                order_origin_id integer,
+                order_number text,
+                volume_number integer,
+                kit_number text,
+                extra_info jsonb,
+                product_id integer,
+                item_id integer,
+                reject text
+            ) ON COMMIT DROP
+        """))
+
+    async def _copy(self, db: Session, records: List[StagingRecord]) -> None:
+        conn = await db.connection()
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            STAGING_TABLE, records=records, columns=self.STAGING_COLUMNS)
+
+    async def _stage(self, db: Session, chunks: AsyncIterator[bytes], format: Literal['csv', 'jsonl']) -> int:
+        """Lê o arquivo e envia as linhas bem formadas para a staging em lotes de COPY."""
+        total = 0
+        batch: List[StagingRecord] = []
+        async for line, row in self._iter_rows(chunks, format):
+            total += 1
+            if isinstance(row, str):
+                self._reject(line, None, row)
+                continue
+            try:
+                batch.append(self._record(line, row))
+            except ValueError as e:
+                serial = row.get("serial")
+                self._reject(line, str(serial) if serial else None, str(e))
+                continue
+            if len(batch) >= self.batch_size:
+                await self._copy(db, batch)
+                batch = []
+        if batch:
+            await self._copy(db, batch)
+        return total
+
+    async def _merge(self, db: Session) -> int:
+        """Valida a staging e incorpora as linhas aceitas. Retorna quantos items foram criados."""
+        await db.execute(text(f"ANALYZE {STAGING_TABLE}"))
+        await db.execute(text(f"""
+            UPDATE {STAGING_TABLE} s SET product_id = p.id
+            FROM logistic_stock_product p WHERE p.sku = s.sku
+        """))
+        for reason, sql in self.VALIDATIONS:
+            await db.execute(text(sql), {"reason": reason})
+
+        # items: ON CONFLICT cobre serial criado em paralelo depois da validação
+        await db.execute(text(f"""
+            WITH novos AS (
+                INSERT INTO logistic_stock_item (created_at, product_id, serial, status, location_id, extra_info)
+                SELECT now(), s.product_id, s.serial, :status, s.location_id, s.extra_info
+                FROM {STAGING_TABLE} s
+                WHERE s.reject IS NULL
+                ORDER BY s.line
+                ON CONFLICT (serial) DO NOTHING
+                RETURNING id, serial
+            )
+            UPDATE {STAGING_TABLE} s SET item_id = novos.id
+            FROM novos WHERE s.serial = novos.serial AND s.reject IS NULL
+        """), {"status": ItemStatus.IN_DEPOT.value})
+        await db.execute(text(f"""
+            UPDATE {STAGING_TABLE} SET reject = :reason
+            WHERE reject IS NULL AND item_id IS NULL
+        """), {"reason": "Serial já existe no estoque"})
+
+        # movimentos de entrada + last_in_movement dos items criados
+        await db.execute(text(f"""
+            WITH movimentos AS (
+                INSERT INTO logistic_stock_movement
+                    (movement_type, item_id, order_origin_id, to_location_id, order_number,
+                     volume_number, kit_number, created_at, created_by)
+                SELECT :movement_type, s.item_id, s.order_origin_id, s.location_id, s.order_number,
+                       s.volume_number, s.kit_number, now(), :created_by
+                FROM {STAGING_TABLE} s
+                WHERE s.item_id IS NOT NULL
+                RETURNING id, item_id
+            )
+            UPDATE logistic_stock_item i SET last_in_movement_id = movimentos.id
+            FROM movimentos WHERE i.id = movimentos.item_id
+        """), {"movement_type": MovementType.IN.value, "created_by": self.created_by})
+
+        # posição de estoque (mesmo critério de services/stock_summary.py: só items com origem)
+        await db.execute(text(f"""
+            INSERT INTO logistic_stock_position_summary
+                (location_id, stock_type, product_id, ztipo, status, qty, updated_at)
+            SELECT s.location_id,
+                   COALESCE(o.stock_type, ''),
+                   s.product_id,
+                   COALESCE(s.extra_info -> 'consulta_sincrona' ->> 'ZTIPO', ''),
+                   :status,
+                   COUNT(*),
+                   now()
+            FROM {STAGING_TABLE} s
+            JOIN logistic_stock_order_origin o ON o.id = s.order_origin_id
+            WHERE s.item_id IS NOT NULL
+            GROUP BY 1, 2, 3, 4
+            ON CONFLICT ON CONSTRAINT uq_stock_position_summary_key DO UPDATE
+            SET qty = logistic_stock_position_summary.qty + EXCLUDED.qty,
+                updated_at = now()
+        """), {"status": ItemStatus.IN_DEPOT.value})
+
+        result = await db.execute(text(f"""
+            SELECT
+                COUNT(*) FILTER (WHERE item_id IS NOT NULL) AS imported,
+                COUNT(*) FILTER (WHERE reject IS NOT NULL) AS rejected
+            FROM {STAGING_TABLE}
+        """))
+        imported, rejected = result.one()
+        self.rejected += rejected
+
+        remaining = self.max_rejects - len(self.rejects)
+        if remaining > 0 and rejected:
+            result = await db.execute(text(f"""
+                SELECT line, serial, reject FROM {STAGING_TABLE}
+                WHERE reject IS NOT NULL ORDER BY line LIMIT :limit
+            """), {"limit": remaining})
+            self.rejects.extend(
+                StockImportReject(line=line, serial=serial, reason=reason)
+                for line, serial, reason in result.all())
+            self.rejects.sort(key=lambda r: r.line)
+        return imported
+
+    async def run(
+        self, db: Session, chunks: AsyncIterator[bytes], format: Literal['csv', 'jsonl'] = 'csv'
+    ) -> StockImportResult:
+        """
+        Executa a importação numa única transação. Com dry_run, valida e faz
+        todo o merge, mas desfaz no fim (serve para conferir as recusas).
+        ValueError para arquivo inválido (ex.: cabeçalho sem as colunas obrigatórias).
+        """
+        try:
+            await self._create_staging(db)
+            total = await self._stage(db, chunks, format)
+            imported = await self._merge(db)
+            if self.dry_run:
+                await db.rollback()
+            else:
+                await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
+        logger.info(
+            f"Importação de estoque{' (simulação)' if self.dry_run else ''}: "
+            f"{total} linhas, {imported} importadas, {self.rejected} recusadas")
+        return StockImportResult(
+            total=total,
+            imported=imported,
+            rejected=self.rejected,
+            rejects=self.rejects,
+            dry_run=self.dry_run
+        )
@@ -0,0 +1,160 @@
+from collections import Counter
+from typing import Any, Dict, Iterable, Optional
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from crud.crud_item import item
+from crud.crud_stock_summary import stock_summary_crud, SummaryKey
+from schemas.stock_summary_schema import StockSummaryDrift, StockSummaryReconcileResult
+
+logger = logging.getLogger(__name__)
+
+
+class StockSummaryService:
+    """
+    Manutenção incremental da posição de estoque (logistic_stock_position_summary).
+
+    Quem altera a posição de items tira um snapshot das chaves antes (com lock)
+    e depois da alteração (na mesma transação) e aplica a diferença com apply().
+    Items sem produto ou sem movimento de entrada com origem não entram no
+    resumo (mesmo critério dos joins dos endpoints de resumo).
+    """
+
+    KEY_COLUMNS = [
+        "id",
+        "location_id",
+        "product_id",
+        "status",
+        "extra_info.consulta_sincrona.ZTIPO",
+        "last_in_movement.origin.id",
+        "last_in_movement.origin.stock_type",
+    ]
+
+    def _key(self, row: Dict[str, Any]) -> Optional[SummaryKey]:
+        if row["product_id"] is None or row["last_in_movement_origin_id"] is None:
+            return None
+        return (
+            row["location_id"],
+            row["last_in_movement_origin_stock_type"] or '',
+            row["product_id"],
+            row["extra_info_consulta_sincrona_ZTIPO"] or '',
+            row["status"],
+        )
+
+    async def snapshot(
+        self, db: Session, item_ids: Iterable[int], lock: bool = False
+    ) -> Dict[int, Optional[SummaryKey]]:
+        """
+        Chave atual no resumo de cada item (None se o item não é contabilizado).
+
+        O snapshot "antes" deve usar lock=True: trava as linhas dos items
+        (FOR UPDATE) até o commit, então uma movimentação concorrente do mesmo
+        item espera e lê a chave já atualizada, em vez de aplicar o mesmo -1.
+        """
+        item_ids = list(set(item_ids))
+        if not item_ids:
+            return {}
+        rows = await item.get_multi_columns(
+            db=db,
+            filters=[{"field": "id", "operator": "in", "value": item_ids}],
+            columns=self.KEY_COLUMNS,
+            lock=lock
+        )
+        return {row["id"]: self._key(row) for row in rows}
+
+    async def apply(
+        self,
+        db: Session,
+        before: Dict[int, Optional[SummaryKey]],
+        after: Dict[int, Optional[SummaryKey]],
+        commit: bool = True
+    ) -> None:
+        """Aplica no resumo a diferença entre os snapshots antes/depois."""
+        deltas: Counter = Counter()
+        for key in before.values():
+            if key:
+                deltas[key] -= 1
+        for key in after.values():
+            if key:
+                deltas[key] += 1
+        await stock_summary_crud.apply_deltas(db=db, deltas=deltas, commit=commit)
+
+    async def reconcile(self, db: Session, fix: bool = False) -> StockSummaryReconcileResult:
+        """
+        Recalcula a posição de estoque a partir de logistic_stock_item e compara
+        com o resumo. Com fix=True, corrige as divergências e remove as chaves zeradas.
+        """
+        if fix:
+            # bloqueia as atualizações incrementais enquanto o resumo é recalculado
+            await db.execute(text(
+                "LOCK TABLE logistic_stock_position_summary IN EXCLUSIVE MODE"))
+
+        expected_rows = await item.get_aggregates(
+            db=db,
+            aggregations=[{"op": "count", "field": "id", "alias": "qty"}],
+            group_by=[
+                "location_id",
+                "last_in_movement.origin.stock_type",
+                "product_id",
+                "extra_info.consulta_sincrona.ZTIPO",
+                "status",
+            ]
+        )
+        expected: Counter = Counter()
+        for row in expected_rows:
+            if row["product_id"] is None:
+                continue
+            key = (row["location_id"], row["stock_type"] or '', row["product_id"],
+                   row["ZTIPO"] or '', row["status"])
+            expected[key] += row["qty"]
+
+        actual_rows = await stock_summary_crud.get_multi_columns(
+            db=db,
+            filters=[],
+            columns=["location_id", "stock_type", "product_id",
+                     "ztipo", "status", "qty"]
+        )
+        actual: Counter = Counter()
+        for row in actual_rows:
+            key = (row["location_id"], row["stock_type"], row["product_id"],
+                   row["ztipo"], row["status"])
+            actual[key] += row["qty"]
+
+        deltas: Dict[SummaryKey, int] = {}
+        drift = []
+        for key in set(expected) | set(actual):
+            if expected[key] != actual[key]:
+                deltas[key] = expected[key] - actual[key]
+                location_id, stock_type, product_id, ztipo, _status = key
+                drift.append(StockSummaryDrift(
+                    location_id=location_id,
+                    stock_type=stock_type or None,
+                    product_id=product_id,
+                    ztipo=ztipo or None,
+                    status=_status,
+                    expected=expected[key],
+                    actual=actual[key],
+                ))
+
+        logger.info(
+            f"Posição de estoque: {len(expected)} grupos, {len(drift)} divergentes")
+
+        if fix:
+            try:
+                await stock_summary_crud.apply_deltas(db=db, deltas=deltas, commit=False)
+                await stock_summary_crud.remove_empty(db=db, commit=False)
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+
+        return StockSummaryReconcileResult(
+            groups=len(expected),
+            drift=drift,
+            fixed=fix
+        )
+
+
+stock_summary_service = StockSummaryService()
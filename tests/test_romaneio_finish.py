@@ -0,0 +1,113 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import BackgroundTasks, HTTPException, Response
+from sqlalchemy.dialects import postgresql
+
+from api.api_v1.endpoints import romaneio_v2
+from crud.crud_romaneio import romaneio_crud
+from schemas.romaneio_schema import RomaneioFinisheData
+from services.movement import MovementService
+
+
+class FakeResult:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar_one_or_none(self):
+        return self.value
+
+
+class FakeSession:
+    """Guarda os statements executados e devolve o id configurado no RETURNING."""
+
+    def __init__(self, returning=None):
+        self.returning = returning
+        self.statements = []
+        self.commits = 0
+
+    async def execute(self, stmt, *args, **kwargs):
+        self.statements.append(stmt)
+        return FakeResult(self.returning)
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        pass
+
+
+def test_claim_reassume_finalizacao_interrompida_apos_o_lease():
+    db = FakeSession(returning=10)
+    before = datetime.now(timezone.utc)
+
+    claimed = asyncio.run(romaneio_crud.claim_for_finish(db=db, id=10, lease=600))
+
+    assert claimed is True
+    assert db.commits == 1
+    compiled = db.statements[0].compile(dialect=postgresql.dialect())
+    sql = str(compiled)
+    assert "logistic_stock_reverse.status_rom = %(status_rom_1)s" in sql
+    assert "logistic_stock_reverse.updated_at < %(updated_at_1)s" in sql
+    params = compiled.params
+    assert params["status_rom_1"] == 'ABERTO'
+    assert params["status_rom_2"] == 'EM PROCESSAMENTO'
+    # lease: só reassume o que está parado há mais de 600s
+    assert params["updated_at_1"] <= before - timedelta(seconds=600) + timedelta(seconds=1)
+
+
+def test_claim_recusado_quando_outra_finalizacao_esta_ativa():
+    db = FakeSession(returning=None)
+
+    assert asyncio.run(romaneio_crud.claim_for_finish(db=db, id=10, lease=600)) is False
+
+
+def _finish(monkeypatch, status_rom, claimed):
+    calls = {}
+
+    async def get_last_by_filters(db, filters, **kwargs):
+        return SimpleNamespace(id=10, client_id=1, status_rom=status_rom)
+
+    async def get_last_by_filters_cached(db, filters):
+        return SimpleNamespace(id=5)
+
+    async def claim_for_finish(db, id, update_by=None, lease=None):
+        calls["claim"] = id
+        return claimed
+
+    async def finish_romaneio(self, db, romaneio, finish_data, order_origin_id=None, **kwargs):
+        calls["finish"] = romaneio.id
+        return {"total": 1, "processed": 1, "skipped": 0, "failed": 0, "errors": []}
+
+    monkeypatch.setattr(romaneio_v2.romaneio, "get_last_by_filters", get_last_by_filters)
+    monkeypatch.setattr(romaneio_v2.romaneio, "claim_for_finish", claim_for_finish)
+    monkeypatch.setattr(romaneio_v2.origin, "get_last_by_filters_cached", get_last_by_filters_cached)
+    monkeypatch.setattr(MovementService, "finish_romaneio", finish_romaneio)
+
+    response = asyncio.run(romaneio_v2.finish_romaneio(
+        romaneio_number="AR00010",
+        location_id=0,
+        finish_data=RomaneioFinisheData(finished_by="teste", movement_type="RETURN"),
+        background_tasks=BackgroundTasks(),
+        response=Response(),
+        async_mode=False,
+        db=FakeSession()
+    ))
+    return response, calls
+
+
+def test_finalizacao_interrompida_pode_ser_retomada(monkeypatch):
+    # romaneio ficou EM PROCESSAMENTO (worker reiniciado no meio do job) e o lease expirou
+    response, calls = _finish(monkeypatch, status_rom='EM PROCESSAMENTO', claimed=True)
+
+    assert calls == {"claim": 10, "finish": 10}
+    assert response.status_rom == "FECHADO"
+
+
+def test_finalizacao_em_andamento_retorna_409(monkeypatch):
+    with pytest.raises(HTTPException) as exc:
+        _finish(monkeypatch, status_rom='EM PROCESSAMENTO', claimed=False)
+
+    assert exc.value.status_code == 409
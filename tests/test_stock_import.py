@@ -0,0 +1,49 @@
+import asyncio
+
+from services.stock_import import StockImportService
+
+
+def _rows(content: str, chunk_size: int = 7):
+    data = content.encode("utf-8")
+
+    async def chunks():
+        for i in range(0, len(data), chunk_size):
+            yield data[i:i + chunk_size]
+
+    async def collect():
+        service = StockImportService(created_by="teste")
+        return [row async for row in service._iter_rows(chunks(), 'csv')]
+
+    return asyncio.run(collect())
+
+
+def test_csv_campo_entre_aspas_com_quebra_de_linha():
+    rows = _rows(
+        'serial,sku,location_id,extra_info\r\n'
+        'A1,S1,1,"{""obs"": ""linha 1\r\nlinha 2""}"\r\n'
+        '\r\n'
+        'A2,S2,1,\r\n'
+    )
+
+    assert rows == [
+        (2, {"serial": "A1", "sku": "S1", "location_id": "1",
+             "extra_info": '{"obs": "linha 1\nlinha 2"}'}),
+        (5, {"serial": "A2", "sku": "S2", "location_id": "1", "extra_info": ""}),
+    ]
+
+
+def test_csv_linha_com_colunas_faltando_mantem_numero_da_linha():
+    rows = _rows(
+        'serial,sku,location_id\n'
+        'A1,"descrição\ncom quebra",1\n'
+        'A2,S2\n'
+    )
+
+    assert rows[0][0] == 2
+    assert rows[1] == (4, "Esperadas 3 colunas, encontradas 2")
+
+
+def test_csv_aspas_nao_fechadas_no_fim_do_arquivo():
+    rows = _rows('serial,sku,location_id\nA1,"S1,1\n')
+
+    assert rows == [(2, "Campo entre aspas não fechado até o fim do arquivo")]